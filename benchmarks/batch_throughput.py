@@ -0,0 +1,85 @@
+"""Compare task writes through POST /api/tasks/batch against one request per task.
+
+Usage:
+    python benchmarks/batch_throughput.py [--tasks 500]
+
+Runs against the app's configured database (DATABASE_URL or the SQLite file),
+which is initialized if needed.
+Each mode creates, then updates, then deletes the same number of tasks.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.main import create_app
+
+app = create_app({'INIT_DB_ON_START': True})
+
+def admin_headers(client):
+    response = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+    return {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+def per_item(client, headers, count):
+    timings = {}
+
+    start = time.perf_counter()
+    ids = [
+        client.post('/api/tasks', json={'title': f'Per-item task {i}', 'priority': 'low'}, headers=headers)
+        .get_json()['task']['id']
+        for i in range(count)
+    ]
+    timings['create'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for task_id in ids:
+        client.put(f'/api/tasks/{task_id}', json={'status': 'in_progress'}, headers=headers)
+    timings['update'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for task_id in ids:
+        client.delete(f'/api/tasks/{task_id}', headers=headers)
+    timings['delete'] = time.perf_counter() - start
+    return timings
+
+def batched(client, headers, count):
+    def run(operations):
+        response = client.post('/api/tasks/batch', json={'operations': operations}, headers=headers)
+        return response.get_json()['results']
+
+    timings = {}
+
+    start = time.perf_counter()
+    results = run([{'op': 'create', 'data': {'title': f'Batch task {i}', 'priority': 'low'}} for i in range(count)])
+    timings['create'] = time.perf_counter() - start
+    ids = [result['id'] for result in results]
+
+    start = time.perf_counter()
+    run([{'op': 'update', 'id': task_id, 'data': {'status': 'in_progress'}} for task_id in ids])
+    timings['update'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    run([{'op': 'delete', 'id': task_id} for task_id in ids])
+    timings['delete'] = time.perf_counter() - start
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=500, help='tasks written per mode (max 1000)')
+    args = parser.parse_args()
+
+    client = app.test_client()
+    headers = admin_headers(client)
+    single = per_item(client, headers, args.tasks)
+    batch = batched(client, headers, args.tasks)
+
+    print(f"{'operation':>10} {'per-item/s':>12} {'batch/s':>10} {'speedup':>8}")
+    for operation in ('create', 'update', 'delete'):
+        single_rate = args.tasks / single[operation]
+        batch_rate = args.tasks / batch[operation]
+        print(f'{operation:>10} {single_rate:>12.0f} {batch_rate:>10.0f} {batch_rate / single_rate:>7.1f}x')
+
+if __name__ == '__main__':
+    main()
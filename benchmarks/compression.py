@@ -0,0 +1,72 @@
+"""Compare response bytes and compression CPU time across compression profiles.
+
+Usage:
+    python benchmarks/compression.py [--tasks 2000] [--repeat 5]
+
+Uses a private in-memory database. Reads the task list (500 per page,
+embedded users) and the CSV export with each Accept-Encoding and each
+profile of src/compression.py, taking the CPU time from the compressor's
+own accounting. Best of --repeat runs.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.main import create_app
+from src.compression import COMPRESSION_PROFILES, Encoder, brotli
+
+app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'INIT_DB_ON_START': True})
+
+REQUESTS = {
+    'task list': ('/api/tasks', {'limit': 500}),
+    'csv export': ('/api/tasks/export', {'format': 'csv'}),
+}
+
+def seed(client, headers, count):
+    for start in range(0, count, 1000):
+        client.post('/api/tasks/batch', headers=headers, json={'operations': [
+            {'op': 'create', 'data': {
+                'title': f'Compression task {i}',
+                'description': 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 4,
+                'priority': 'medium',
+                'due_date': f'2030-01-{i % 28 + 1:02d}T00:00:00',
+            }} for i in range(start, min(start + 1000, count))
+        ]})
+
+def measure(body, encoding, levels, repeat):
+    best = None
+    for _ in range(repeat):
+        encoder = Encoder(encoding, levels)
+        # Fed in 8 KiB chunks, like a streamed export
+        size = sum(len(encoder.process(body[i:i + 8192])) for i in range(0, len(body), 8192))
+        size += len(encoder.finish())
+        if best is None or encoder.cpu_seconds < best[1]:
+            best = (size, encoder.cpu_seconds)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=2000, help='tasks to create before measuring')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per variant')
+    args = parser.parse_args()
+
+    client = app.test_client()
+    login = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+    headers = {'Authorization': f"Bearer {login.get_json()['access_token']}"}
+    seed(client, headers, args.tasks)
+
+    encodings = ['gzip'] + (['br'] if brotli is not None else [])
+    print(f"{'response':>11} {'encoding':>8} {'profile':>9} {'KiB':>7} {'ratio':>6} {'cpu ms':>7}")
+    for name, (path, params) in REQUESTS.items():
+        body = client.get(path, query_string=params, headers=headers).data
+        print(f"{name:>11} {'identity':>8} {'-':>9} {len(body) / 1024:>7.0f} {1:>6.2f} {0:>7.1f}")
+        for encoding in encodings:
+            for profile, levels in COMPRESSION_PROFILES.items():
+                size, cpu = measure(body, encoding, levels, args.repeat)
+                print(f'{name:>11} {encoding:>8} {profile:>9} {size / 1024:>7.0f} '
+                      f'{size / len(body):>6.2f} {cpu * 1000:>7.1f}')
+
+if __name__ == '__main__':
+    main()
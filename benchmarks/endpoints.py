@@ -0,0 +1,418 @@
+"""Measure latency, throughput and SQL statements per request of every API endpoint.
+
+Usage:
+    python benchmarks/endpoints.py [--tasks 10000] [--users 50] [--requests 200] [--concurrency 4]
+                                   [--http] [--workers 4] [--threads 16] [--only TEXT]
+                                   [--save-baseline FILE] [--baseline FILE] [--tolerance 0.25]
+
+The dataset is generated once per --tasks, --users and --seed with
+`flask seed-data` into benchmarks/data/, and every run works on a fresh copy
+of it, so runs with the same options start from the same rows. Requests go
+through the Flask test client from --concurrency threads; with --http the
+copy is served by gunicorn with --workers processes and the requests are
+sent over HTTP. Every route of routes/auth.py, routes/user.py and
+routes/task.py is driven in turn, some with a second variant (a plain user,
+the normalized shape). SQL statements per request are read from /metrics,
+which in --http mode flushes on every request.
+
+--save-baseline writes the results as JSON. --baseline compares against such
+a file: an endpoint whose p95 latency grew by more than --tolerance (and at
+least 1 ms), or that issues more SQL statements per request, is reported as
+a regression and the exit status is 1. Compare runs made with the same
+options on the same machine.
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import re
+import shutil
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.seed import SEED_PASSWORD
+
+DATA_DIR = os.path.join(ROOT, 'benchmarks', 'data')
+ADMIN = ('admin', 'admin123')
+
+# p95 growth below this is noise, whatever the ratio
+MIN_REGRESSION_SECONDS = 0.001
+# Extra SQL statements per request tolerated before an endpoint counts as regressed
+SQL_SLACK = 0.5
+
+SQL_SERIES = re.compile(r'^http_request_sql_queries_(sum|count)\{method="([^"]*)",endpoint="([^"]*)"\} (\S+)$')
+
+class Endpoint:
+    """One measured request shape; build(ctx, rng) returns its path and body"""
+
+    def __init__(self, name, build, caller='admin', limit=None, stream=False, collect=None):
+        self.method = name.split()[0]
+        self.name = name
+        self.build = build
+        self.caller = caller
+        self.limit = limit
+        # Streams are timed to their response headers; the body never ends
+        self.stream = stream
+        # Called with each response body, to keep ids for later endpoints
+        self.collect = collect
+
+def query(path, **params):
+    return f'{path}?{urlencode(params)}' if params else path
+
+def random_task(ctx, rng):
+    return rng.randint(*ctx['task_ids'])
+
+def created(key, field):
+    return lambda ctx, body: ctx[key].append(json.loads(body)[field]['id'])
+
+def pop(key, path):
+    return lambda ctx, rng: (path.format(ctx[key].pop()), {})
+
+# In run order: deletes use what the creates before them returned
+ENDPOINTS = [
+    # routes/auth.py
+    Endpoint('POST /api/auth/login', lambda ctx, rng: (
+        '/api/auth/login', {'json': {'username': ctx['username'], 'password': SEED_PASSWORD}}), limit=20),
+    Endpoint('POST /api/auth/refresh', lambda ctx, rng: ('/api/auth/refresh', {}), caller='refresh'),
+    Endpoint('GET /api/auth/me', lambda ctx, rng: ('/api/auth/me', {}), caller='user'),
+    Endpoint('POST /api/auth/change-password', lambda ctx, rng: ('/api/auth/change-password', {
+        'json': {'current_password': SEED_PASSWORD, 'new_password': SEED_PASSWORD}}), caller='user', limit=20),
+    Endpoint('PUT /api/auth/update-profile', lambda ctx, rng: ('/api/auth/update-profile', {
+        'json': {'display_name': f'Benchmark User {rng.randint(1, 999)}'}}), caller='user'),
+    # routes/user.py
+    Endpoint('GET /api/users', lambda ctx, rng: ('/api/users', {})),
+    Endpoint('POST /api/users', lambda ctx, rng: ('/api/users', {'json': {
+        'username': f"bench_{ctx['run']}_{rng.getrandbits(48):x}", 'email': f"bench_{rng.getrandbits(48):x}@example.com",
+        'password': SEED_PASSWORD, 'display_name': 'Benchmark Account'}}), limit=20, collect=created('created_users', 'user')),
+    Endpoint('GET /api/users/<id>', lambda ctx, rng: (f"/api/users/{rng.choice(ctx['user_ids'])}", {})),
+    Endpoint('PUT /api/users/<id>', lambda ctx, rng: (f"/api/users/{rng.choice(ctx['user_ids'])}", {
+        'json': {'display_name': f'Renamed User {rng.randint(1, 999)}'}})),
+    Endpoint('DELETE /api/users/<id>', pop('created_users', '/api/users/{}')),
+    Endpoint('GET /api/users/lookup', lambda ctx, rng: (query('/api/users/lookup', prefix='seed_us'), {})),
+    Endpoint('GET /api/users/search', lambda ctx, rng: (query('/api/users/search', q=rng.choice(['Berlin', 'Graz'])), {})),
+    # routes/task.py
+    Endpoint('GET /api/tasks', lambda ctx, rng: ('/api/tasks', {})),
+    Endpoint('GET /api/tasks (user)', lambda ctx, rng: ('/api/tasks', {}), caller='user'),
+    Endpoint('GET /api/tasks?shape=normalized', lambda ctx, rng: (query('/api/tasks', shape='normalized'), {})),
+    # Polls from the dataset's version, so only what earlier endpoints wrote comes back
+    Endpoint('GET /api/tasks/changes', lambda ctx, rng: (query('/api/tasks/changes', since=ctx['change_seq']), {})),
+    Endpoint('GET /api/tasks/search', lambda ctx, rng: (
+        query('/api/tasks/search', q=rng.choice(['backup', 'invoice', 'firewall', 'report'])), {})),
+    Endpoint('GET /api/tasks/export', lambda ctx, rng: (query('/api/tasks/export', format='ndjson'), {}), limit=3),
+    Endpoint('GET /api/events', lambda ctx, rng: ('/api/events', {}), caller='user', limit=5, stream=True),
+    Endpoint('POST /api/tasks', lambda ctx, rng: ('/api/tasks', {'json': {
+        'title': 'Benchmark task', 'priority': 'low', 'assignee_uid': ctx['user_id']}}), collect=created('created_tasks', 'task')),
+    Endpoint('POST /api/tasks/batch', lambda ctx, rng: ('/api/tasks/batch', {'json': {'operations': [
+        {'op': 'update', 'id': random_task(ctx, rng), 'data': {'priority': rng.choice(['low', 'high'])}}
+        for _ in range(50)]}})),
+    Endpoint('GET /api/tasks/<id>', lambda ctx, rng: (f'/api/tasks/{random_task(ctx, rng)}', {})),
+    Endpoint('GET /api/tasks/<id>?shape=normalized', lambda ctx, rng: (
+        query(f'/api/tasks/{random_task(ctx, rng)}', shape='normalized'), {})),
+    Endpoint('PUT /api/tasks/<id>', lambda ctx, rng: (f'/api/tasks/{random_task(ctx, rng)}', {
+        'json': {'status': rng.choice(['pending', 'in_progress'])}})),
+    Endpoint('POST /api/tasks/<id>/updates', lambda ctx, rng: (f'/api/tasks/{random_task(ctx, rng)}/updates', {
+        'data': {'comment': 'Benchmark update'}})),
+    Endpoint('DELETE /api/tasks/<id>', pop('created_tasks', '/api/tasks/{}')),
+    Endpoint('GET /api/dashboard/stats', lambda ctx, rng: ('/api/dashboard/stats', {})),
+    Endpoint('GET /api/dashboard/stats (user)', lambda ctx, rng: ('/api/dashboard/stats', {}), caller='user'),
+]
+
+class ClientTransport:
+    """Requests through the Flask test client, one client per thread"""
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def request(self, method, path, headers=None, stream=False, **body):
+        if not hasattr(self.local, 'client'):
+            self.local.client = self.app.test_client()
+        response = self.local.client.open(path, method=method, headers=headers, buffered=not stream, **body)
+        body = b'' if stream else response.get_data()
+        response.close()
+        return response.status_code, body
+
+class HTTPTransport:
+    """Requests over HTTP, one connection per request"""
+
+    def __init__(self, port):
+        self.port = port
+
+    def request(self, method, path, headers=None, stream=False, **body):
+        headers = dict(headers or {})
+        payload = None
+        if 'json' in body:
+            payload = json.dumps(body['json']).encode()
+            headers['Content-Type'] = 'application/json'
+        elif 'data' in body:
+            payload = urlencode(body['data']).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=120)
+        try:
+            connection.request(method, path, body=payload, headers=headers)
+            response = connection.getresponse()
+            return response.status, b'' if stream else response.read()
+        finally:
+            connection.close()
+
+def dataset(tasks, users, seed):
+    """Path of the generated database for these options, created on first use"""
+    path = os.path.join(DATA_DIR, f'endpoints-t{tasks}-u{users}-s{seed}.db')
+    if os.path.exists(path):
+        return path
+    os.makedirs(DATA_DIR, exist_ok=True)
+    partial = f'{path}.partial'
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(partial + suffix):
+            os.remove(partial + suffix)
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{partial}')
+    flask = [sys.executable, '-m', 'flask', '--app', 'src.main']
+    print(f'Generating {tasks} tasks and {users} users into {os.path.relpath(path, ROOT)}')
+    for command in (['init-db'], ['seed-admin'],
+                    ['seed-data', '--tasks', str(tasks), '--users', str(users), '--seed', str(seed)]):
+        subprocess.run(flask + command, cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+    connection = sqlite3.connect(partial)
+    # Folds the WAL into the file and removes it, so the file alone is the dataset; the app turns WAL back on
+    connection.execute('PRAGMA journal_mode=DELETE')
+    connection.close()
+    os.replace(partial, path)
+    return path
+
+def inspect(path):
+    """Ids the endpoints draw from, read straight from the working copy"""
+    connection = sqlite3.connect(path)
+    try:
+        # The benchmark user is the busiest assignee, so its lists are the largest
+        user_id, username = connection.execute(
+            "SELECT user.id, user.username FROM task JOIN user ON user.id = task.assignee_uid "
+            "WHERE user.is_active AND user.username LIKE 'seed%' GROUP BY user.id ORDER BY count(*) DESC LIMIT 1"
+        ).fetchone()
+        return {
+            'user_id': user_id,
+            'username': username,
+            'task_ids': connection.execute('SELECT min(id), max(id) FROM task').fetchone(),
+            'user_ids': [row[0] for row in connection.execute(
+                "SELECT id FROM user WHERE username LIKE 'seed%' AND id != ? ORDER BY id", (user_id,))],
+            'change_seq': connection.execute(
+                "SELECT version FROM change_stamps WHERE scope = 'tasks'").fetchone()[0],
+            'created_users': [],
+            'created_tasks': [],
+            'run': f'{os.getpid()}{int(time.time())}',
+        }
+    finally:
+        connection.close()
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_server(workers, threads, env):
+    port = free_port()
+    server = subprocess.Popen([
+        sys.executable, '-m', 'gunicorn', '-w', str(workers), '-k', 'gthread', '--threads', str(threads),
+        '-b', f'127.0.0.1:{port}', '--log-level', 'warning',
+        "src.main:create_app({'METRICS_FLUSH_INTERVAL': 0})",
+    ], cwd=ROOT, env=env)
+    transport = HTTPTransport(port)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError('gunicorn exited during startup')
+        try:
+            if transport.request('GET', '/metrics')[0] == 200:
+                return server, transport
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError('gunicorn did not start within 60 seconds')
+
+def login(transport, username, password):
+    status, body = transport.request('POST', '/api/auth/login', json={'username': username, 'password': password})
+    if status != 200:
+        raise RuntimeError(f'Login as {username} failed with {status}: {body[:200]!r}')
+    return json.loads(body)
+
+def sql_totals(transport):
+    """SQL statements and requests counted so far, leaving out the scrapes themselves"""
+    totals = {'sum': 0.0, 'count': 0.0}
+    for line in transport.request('GET', '/metrics')[1].decode().splitlines():
+        match = SQL_SERIES.match(line)
+        if match and match.group(3) != '/metrics':
+            totals[match.group(1)] += float(match.group(4))
+    return totals
+
+def percentile(ordered, q):
+    return ordered[max(math.ceil(q * len(ordered)) - 1, 0)]
+
+def measure(transport, endpoint, ctx, headers, count, concurrency, seed):
+    rng = random.Random(f'{seed}:{endpoint.name}')
+    requests = [endpoint.build(ctx, rng) for _ in range(count)]
+    method = endpoint.method
+
+    def timed(request):
+        path, kwargs = request
+        started = time.perf_counter()
+        status, body = transport.request(method, path, headers=headers[endpoint.caller], stream=endpoint.stream,
+                                         **kwargs)
+        return time.perf_counter() - started, status, body
+
+    before = sql_totals(transport)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(timed, requests))
+    elapsed = time.perf_counter() - started
+    after = sql_totals(transport)
+
+    errors = 0
+    for _, status, body in results:
+        if status >= 400:
+            errors += 1
+        elif endpoint.collect:
+            endpoint.collect(ctx, body)
+    latencies = sorted(latency for latency, _, _ in results)
+    counted = after['count'] - before['count']
+    return {
+        'requests': len(results),
+        'errors': errors,
+        'rps': len(results) / elapsed,
+        'p50': percentile(latencies, 0.5),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'sql': (after['sum'] - before['sum']) / counted if counted else None,
+    }
+
+def compare(result, base, tolerance):
+    """Regression flags of one endpoint against its baseline"""
+    flags = []
+    if result['p95'] > base['p95'] * (1 + tolerance) and result['p95'] - base['p95'] >= MIN_REGRESSION_SECONDS:
+        flags.append('p95')
+    if result['sql'] is not None and base['sql'] is not None and result['sql'] > base['sql'] + SQL_SLACK:
+        flags.append('sql')
+    return flags
+
+def report(results, baseline, tolerance):
+    header = f"{'endpoint':<40} {'n':>4} {'err':>4} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'sql':>6}"
+    if baseline:
+        header += f" {'p95 Δ':>7} {'sql Δ':>6}"
+    print(header)
+    regressions = []
+    for name, result in results.items():
+        sql = '-' if result['sql'] is None else f"{result['sql']:.1f}"
+        line = (f"{name:<40} {result['requests']:>4} {result['errors']:>4} {result['rps']:>8.1f} "
+                f"{result['p50'] * 1000:>8.1f} {result['p95'] * 1000:>8.1f} {result['p99'] * 1000:>8.1f} {sql:>6}")
+        base = (baseline or {}).get('results', {}).get(name)
+        if base:
+            change = (result['p95'] / base['p95'] - 1) * 100 if base['p95'] else 0
+            sql_change = '-' if result['sql'] is None or base['sql'] is None else f"{result['sql'] - base['sql']:+.1f}"
+            line += f' {change:>+6.0f}% {sql_change:>6}'
+            flags = compare(result, base, tolerance)
+            if flags:
+                line += '  REGRESSION (' + ', '.join(flags) + ')'
+                regressions.append(name)
+        elif baseline:
+            line += f" {'new':>7}"
+        print(line)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=10000, help='tasks in the generated dataset')
+    parser.add_argument('--users', type=int, default=50, help='users in the generated dataset')
+    parser.add_argument('--seed', type=int, default=1, help='seed of the generated dataset and requests')
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint (some are capped lower)')
+    parser.add_argument('--concurrency', type=int, default=4, help='requests in flight at once')
+    parser.add_argument('--http', action='store_true', help='serve with gunicorn and send requests over HTTP')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes with --http')
+    parser.add_argument('--threads', type=int, default=16, help='threads per gunicorn worker with --http')
+    parser.add_argument('--only', help='measure only endpoints whose name contains this text')
+    parser.add_argument('--save-baseline', metavar='FILE', help='write the results to FILE')
+    parser.add_argument('--baseline', metavar='FILE', help='compare against results saved with --save-baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 growth against the baseline')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    settings = {
+        'mode': 'http' if args.http else 'client',
+        'tasks': args.tasks,
+        'users': args.users,
+        'seed': args.seed,
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'workers': args.workers if args.http else None,
+    }
+    if baseline and baseline.get('settings') != settings:
+        print(f"Warning: baseline was measured with {baseline.get('settings')}, this run uses {settings}")
+
+    workdir = tempfile.mkdtemp(prefix='endpoints-')
+    path = os.path.join(workdir, 'app.db')
+    shutil.copy(dataset(args.tasks, args.users, args.seed), path)
+    ctx = inspect(path)
+
+    # Settings that would change what is measured are left at their defaults
+    for name in ('RENDER', 'METRICS_DIR', 'METRICS_TOKEN', 'COMPRESS_RESPONSES'):
+        os.environ.pop(name, None)
+    os.environ.update(DATABASE_URL=f'sqlite:///{path}', INIT_DB_ON_START='0')
+    server = None
+    try:
+        if args.http:
+            env = dict(os.environ, METRICS_DIR=os.path.join(workdir, 'metrics'))
+            server, transport = start_server(args.workers, args.threads, env)
+        else:
+            from src.main import create_app
+            transport = ClientTransport(create_app())
+
+        admin = login(transport, *ADMIN)
+        user = login(transport, ctx['username'], SEED_PASSWORD)
+        headers = {
+            'admin': {'Authorization': f"Bearer {admin['access_token']}"},
+            'user': {'Authorization': f"Bearer {user['access_token']}"},
+            'refresh': {'Authorization': f"Bearer {admin['refresh_token']}"},
+        }
+
+        results = {}
+        for endpoint in ENDPOINTS:
+            if args.only and args.only not in endpoint.name:
+                continue
+            count = min(args.requests, endpoint.limit or args.requests)
+            if endpoint.name.startswith('DELETE'):
+                # As many as the matching POST created
+                count = min(count, len(ctx['created_users' if '/users' in endpoint.name else 'created_tasks']))
+            if count:
+                results[endpoint.name] = measure(transport, endpoint, ctx, headers, count, args.concurrency, args.seed)
+    finally:
+        if server is not None:
+            # SIGINT is gunicorn's quick shutdown; open event streams would hold up a graceful one
+            server.send_signal(signal.SIGINT)
+            server.wait(30)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{settings['mode']} mode, {args.tasks} tasks, {args.users} users, concurrency {args.concurrency}"
+          + (f', {args.workers} workers' if args.http else ''))
+    regressions = report(results, baseline, args.tolerance)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({'settings': settings, 'results': results}, f, indent=2)
+        print(f'Baseline written to {args.save_baseline}')
+    if regressions:
+        print(f"{len(regressions)} endpoint(s) regressed against {args.baseline}: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
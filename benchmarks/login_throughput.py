@@ -0,0 +1,76 @@
+"""Measure /api/auth/login throughput at several client concurrency levels.
+
+Usage:
+    python benchmarks/login_throughput.py [--requests 64] [--levels 1,2,4,8,16,32]
+
+Runs against the app's configured database (DATABASE_URL or the SQLite file),
+which is initialized if needed, and reports logins/sec, latency and how many
+requests were shed with 503.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.main import create_app
+
+app = create_app({'INIT_DB_ON_START': True})
+from src.models.user import User, db
+
+USERNAME = 'bench_login'
+PASSWORD = 'bench-password'
+
+def ensure_user():
+    with app.app_context():
+        if not User.query.filter_by(username=USERNAME).first():
+            db.session.add(User.create_user(
+                username=USERNAME,
+                email='bench_login@boehmtech.com',
+                password=PASSWORD,
+                display_name='Login Benchmark'
+            ))
+            db.session.commit()
+
+local = threading.local()
+
+def login(_):
+    if not hasattr(local, 'client'):
+        local.client = app.test_client()
+    start = time.perf_counter()
+    response = local.client.post('/api/auth/login', json={'username': USERNAME, 'password': PASSWORD})
+    return response.status_code, time.perf_counter() - start
+
+def run_level(concurrency, total):
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        results = list(executor.map(login, range(total)))
+        elapsed = time.perf_counter() - start
+
+    ok = [latency for status, latency in results if status == 200]
+    shed = sum(1 for status, _ in results if status == 503)
+    ok.sort()
+    p50 = ok[len(ok) // 2] * 1000 if ok else 0
+    p95 = ok[int(len(ok) * 0.95) - 1] * 1000 if ok else 0
+    return len(ok) / elapsed, p50, p95, shed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=64, help='logins per concurrency level')
+    parser.add_argument('--levels', default='1,2,4,8,16,32', help='comma separated client concurrency levels')
+    args = parser.parse_args()
+
+    ensure_user()
+    print(f"pool={app.config.get('PASSWORD_HASH_POOL', 'thread')} "
+          f"workers={app.config['PASSWORD_HASH_WORKERS']} queue={app.config['PASSWORD_HASH_QUEUE_SIZE']} "
+          f"method={app.config['PASSWORD_HASH_METHOD']} cpus={os.cpu_count()}")
+    print(f"{'clients':>8} {'logins/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'503s':>6}")
+    for concurrency in (int(level) for level in args.levels.split(',')):
+        rate, p50, p95, shed = run_level(concurrency, args.requests)
+        print(f'{concurrency:>8} {rate:>10.1f} {p50:>8.1f} {p95:>8.1f} {shed:>6}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Compare serializing 10k tasks through to_dict against row serializers, with both JSON encoders.
+
+Usage:
+    python benchmarks/serialization.py [--tasks 10000] [--repeat 3]
+
+Uses a private in-memory database. The to_dict path loads Task instances
+with their assignee and creator joined and embeds the users; the row path
+reads the columns with Query.with_entities and side-loads the users once,
+as GET /api/tasks?shape=normalized does. Each path is encoded with the
+standard library and, if installed, orjson. Best of --repeat runs.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.main import create_app
+from src.json_provider import FastJSONProvider, orjson
+from src.models.user import User, db
+from src.models.task import Task
+from src.serializers import TASK_ROW, USER_ROW
+
+app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'INIT_DB_ON_START': True})
+
+def seed(count):
+    users = [User(username=f'user_{i}', email=f'user_{i}@boehmtech.com', display_name=f'User {i}',
+                  role='admin' if i < 2 else 'user', password_hash='-') for i in range(7)]
+    db.session.add_all(users)
+    db.session.flush()
+    now = datetime.utcnow()
+    db.session.execute(Task.__table__.insert(), [{
+        'title': f'Task {i}',
+        'description': 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 2,
+        'status': 'pending',
+        'priority': 'medium',
+        'due_date': now + timedelta(days=i % 90),
+        'created_at': now,
+        'updated_at': now,
+        'change_seq': 0,
+        'assignee_uid': users[2 + i % 5].id,
+        'created_by_uid': users[i % 2].id,
+    } for i in range(count)])
+    db.session.commit()
+
+def load_objects():
+    return [task.to_dict() for task in Task.query.options(*Task.eager_users()).all()]
+
+def load_rows():
+    tasks = TASK_ROW.all(Task.query)
+    ids = {task['assignee_uid'] for task in tasks} | {task['created_by_uid'] for task in tasks}
+    users = {str(user['id']): user for user in USER_ROW.all(User.query.filter(User.id.in_(ids)))}
+    return {'tasks': tasks, 'users': users}
+
+def measure(load, provider, repeat):
+    best = None
+    for _ in range(repeat):
+        db.session.remove()
+        start = time.perf_counter()
+        data = load()
+        loaded = time.perf_counter()
+        body = provider.dumpb(data)
+        done = time.perf_counter()
+        if best is None or done - start < best[2]:
+            best = (loaded - start, done - loaded, done - start, len(body))
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=10000, help='tasks to serialize')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per variant')
+    args = parser.parse_args()
+
+    encoders = {'json': FastJSONProvider(app, fast=False)}
+    if orjson is not None:
+        encoders['orjson'] = FastJSONProvider(app, fast=True)
+
+    with app.app_context():
+        seed(args.tasks)
+        print(f"{'path':>8} {'encoder':>8} {'load ms':>8} {'encode ms':>10} {'total ms':>9} {'KiB':>6}")
+        for path, load in (('to_dict', load_objects), ('rows', load_rows)):
+            for name, provider in encoders.items():
+                loading, encoding, total, size = measure(load, provider, args.repeat)
+                print(f'{path:>8} {name:>8} {loading * 1000:>8.0f} {encoding * 1000:>10.0f} '
+                      f'{total * 1000:>9.0f} {size / 1024:>6.0f}')
+
+if __name__ == '__main__':
+    main()
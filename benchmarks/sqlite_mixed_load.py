@@ -0,0 +1,115 @@
+"""Measure read and write throughput under concurrent mixed load.
+
+Usage:
+    python benchmarks/sqlite_mixed_load.py [--readers 4] [--writers 2] [--seconds 10] [--baseline]
+
+Runs against the app's configured database (DATABASE_URL or the SQLite file),
+which is initialized if needed.
+Each reader and writer is a separate process with its own connection pool,
+like gunicorn workers. Readers list and open tasks; writers update task
+status and add task updates. --baseline uses stock SQLite journaling
+(rollback journal, synchronous=FULL) and no lock retries, for comparison.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SEED_TASKS = 200
+
+def admin_headers(client):
+    response = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+    return {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+def read(client, headers, task_ids):
+    if random.random() < 0.5:
+        return client.get('/api/tasks?limit=50', headers=headers)
+    return client.get(f'/api/tasks/{random.choice(task_ids)}', headers=headers)
+
+def write(client, headers, task_ids):
+    task_id = random.choice(task_ids)
+    if random.random() < 0.5:
+        status = random.choice(['pending', 'in_progress', 'completed'])
+        return client.put(f'/api/tasks/{task_id}', json={'status': status}, headers=headers)
+    return client.post(f'/api/tasks/{task_id}/updates', data={'comment': 'Load test update'}, headers=headers)
+
+def worker(kind, task_ids, ready, seconds, results):
+    from src.main import create_app
+
+    app = create_app()
+    client = app.test_client()
+    headers = admin_headers(client)
+    operation = read if kind == 'read' else write
+    ok = errors = 0
+    latencies = []
+    # Measured only once every process has imported the app and logged in
+    ready.wait()
+    stop_at = time.perf_counter() + seconds
+    while time.perf_counter() < stop_at:
+        started = time.perf_counter()
+        response = operation(client, headers, task_ids)
+        latencies.append(time.perf_counter() - started)
+        if response.status_code < 400:
+            ok += 1
+        else:
+            errors += 1
+    results.put((kind, ok, errors, max(latencies, default=0)))
+
+def seed():
+    from src.main import create_app
+    from src.models.user import db
+
+    app = create_app({'INIT_DB_ON_START': True})
+    client = app.test_client()
+    headers = admin_headers(client)
+    operations = [{'op': 'create', 'data': {'title': f'Load task {i}', 'priority': 'low'}} for i in range(SEED_TASKS)]
+    results = client.post('/api/tasks/batch', json={'operations': operations}, headers=headers).get_json()['results']
+    with app.app_context():
+        # Children open their own connections; none may be inherited from here
+        db.engine.dispose()
+    return [result['id'] for result in results]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readers', type=int, default=4, help='reader processes')
+    parser.add_argument('--writers', type=int, default=2, help='writer processes')
+    parser.add_argument('--seconds', type=float, default=10, help='measured duration')
+    parser.add_argument('--baseline', action='store_true', help='stock SQLite settings and no lock retries')
+    args = parser.parse_args()
+
+    if args.baseline:
+        os.environ['SQLITE_TUNING'] = '0'
+        os.environ['DB_LOCK_RETRIES'] = '0'
+
+    task_ids = seed()
+    # Fresh interpreters, so no process inherits another's connections or threads
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    kinds = ['read'] * args.readers + ['write'] * args.writers
+    ready = context.Barrier(len(kinds))
+    processes = [
+        context.Process(target=worker, args=(kind, task_ids, ready, args.seconds, results))
+        for kind in kinds
+    ]
+    for process in processes:
+        process.start()
+    totals = {'read': [0, 0, 0.0], 'write': [0, 0, 0.0]}
+    for _ in processes:
+        kind, ok, errors, slowest = results.get()
+        totals[kind][0] += ok
+        totals[kind][1] += errors
+        totals[kind][2] = max(totals[kind][2], slowest)
+    for process in processes:
+        process.join()
+
+    print(f"mode: {'baseline' if args.baseline else 'tuned'}")
+    print(f"{'kind':>6} {'ok/s':>8} {'errors':>7} {'slowest ms':>11}")
+    for kind, (ok, errors, slowest) in totals.items():
+        print(f'{kind:>6} {ok / args.seconds:>8.0f} {errors:>7} {slowest * 1000:>11.0f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Measure how long a fresh worker process takes to become ready.
+
+Usage:
+    python benchmarks/startup_time.py [--runs 5]
+
+Each run starts a new interpreter, like a gunicorn worker boot, and times
+importing src.main, building the app with create_app(), the first API
+request and the first page load (which builds the static asset manifest).
+Run `flask --app src.main init-db` first so the database exists.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+timings = {{}}
+import src.main
+timings['import'] = time.perf_counter() - started
+app = src.main.create_app()
+timings['create_app'] = time.perf_counter() - started
+client = app.test_client()
+client.get('/api/auth/me')
+timings['first API request'] = time.perf_counter() - started
+client.get('/')
+timings['first page'] = time.perf_counter() - started
+print(json.dumps(timings))
+"""
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='worker boots to measure')
+    args = parser.parse_args()
+
+    probe = PROBE.format(root=ROOT)
+    runs = [
+        json.loads(subprocess.run([sys.executable, '-c', probe], check=True, capture_output=True, text=True)
+                   .stdout.strip().splitlines()[-1])
+        for _ in range(args.runs)
+    ]
+
+    print(f"{'ready after':>18} {'median ms':>10} {'max ms':>8}")
+    for stage in runs[0]:
+        values = [run[stage] * 1000 for run in runs]
+        print(f'{stage:>18} {statistics.median(values):>10.0f} {max(values):>8.0f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Compare task list payload size and response time across response shapes.
+
+Usage:
+    python benchmarks/task_list_payload.py [--tasks 2000]
+
+Runs against the app's configured database (DATABASE_URL or the SQLite file),
+which is initialized if needed. Tasks are created by two admins and assigned
+to a handful of users, then the whole list is read 500 tasks per page with
+embedded users, normalized, and projected to id,title,status,due_date.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.main import create_app
+from src.models.user import User, db
+
+app = create_app({'INIT_DB_ON_START': True})
+
+PASSWORD = 'bench-password'
+SHAPES = {
+    'embedded': {},
+    'normalized': {'shape': 'normalized'},
+    'fields': {'fields': 'id,title,status,due_date'},
+}
+
+def ensure_user(username, role):
+    with app.app_context():
+        user = User.query.filter_by(username=username).first()
+        if not user:
+            user = User.create_user(username=username, email=f'{username}@boehmtech.com', password=PASSWORD,
+                                    display_name=username.replace('_', ' ').title(), role=role)
+            db.session.add(user)
+            db.session.commit()
+        return user.id
+
+def headers_for(client, username):
+    response = client.post('/api/auth/login', json={'username': username, 'password': PASSWORD})
+    return {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+def seed(client, count):
+    admins = [ensure_user(f'bench_admin_{i}', 'admin') for i in range(2)]
+    assignees = [ensure_user(f'bench_user_{i}', 'user') for i in range(5)]
+    for index, admin_id in enumerate(admins):
+        headers = headers_for(client, f'bench_admin_{index}')
+        for start in range(index * count // 2, (index + 1) * count // 2, 1000):
+            stop = min(start + 1000, (index + 1) * count // 2)
+            client.post('/api/tasks/batch', headers=headers, json={'operations': [
+                {'op': 'create', 'data': {
+                    'title': f'Payload task {i}',
+                    'description': 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 4,
+                    'priority': 'medium',
+                    'due_date': f'2030-01-{i % 28 + 1:02d}T00:00:00',
+                    'assignee_uid': assignees[i % len(assignees)],
+                }} for i in range(start, stop)
+            ]})
+
+def read_all(client, headers, params):
+    size = requests = 0
+    cursor = None
+    start = time.perf_counter()
+    while True:
+        query = {'limit': 500, **params, **({'cursor': cursor} if cursor else {})}
+        response = client.get('/api/tasks', query_string=query, headers=headers)
+        size += len(response.data)
+        requests += 1
+        cursor = response.get_json()['next_cursor']
+        if not cursor:
+            return size, time.perf_counter() - start, requests
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=2000, help='tasks to create before measuring')
+    args = parser.parse_args()
+
+    client = app.test_client()
+    seed(client, args.tasks)
+    headers = headers_for(client, 'bench_admin_0')
+
+    print(f"{'shape':>11} {'pages':>6} {'KiB':>8} {'ms':>8}")
+    for name, params in SHAPES.items():
+        read_all(client, headers, params)  # warm up
+        size, elapsed, pages = read_all(client, headers, params)
+        print(f'{name:>11} {pages:>6} {size / 1024:>8.0f} {elapsed * 1000:>8.0f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from threading import Lock
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip is always available
+    brotli = None
+
+# Fingerprinted names never change content, so browsers may keep them for a year
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+# Assets referenced from index.html under a content-hashed name
+FINGERPRINTED_EXTENSIONS = {'.js', '.css'}
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml', 'image/x-icon',
+                      'image/vnd.microsoft.icon')
+
+# Directories under the static folder that are served by their own routes
+EXCLUDED_DIRS = {'uploads'}
+
+class Asset:
+    """One static file held in memory with its precompressed variants"""
+
+    def __init__(self, body, content_type, immutable=False):
+        self.content_type = content_type
+        self.immutable = immutable
+        self.digest = hashlib.sha256(body).hexdigest()[:16]
+        self.variants = {'identity': body}
+        if content_type.startswith(COMPRESSIBLE_TYPES):
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                self.variants['gzip'] = compressed
+            if brotli is not None:
+                compressed = brotli.compress(body, quality=11)
+                if len(compressed) < len(body):
+                    self.variants['br'] = compressed
+
+    def fingerprinted(self):
+        """The same content published under its hashed name, cacheable forever"""
+        asset = Asset.__new__(Asset)
+        asset.__dict__.update(self.__dict__, immutable=True)
+        return asset
+
+    def negotiate(self, accept_encodings):
+        """Pick the smallest variant the client accepts"""
+        best = 'identity'
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and accept_encodings[encoding] > 0 \
+                    and len(self.variants[encoding]) < len(self.variants[best]):
+                best = encoding
+        return best
+
+def fingerprinted_name(name, digest):
+    """script.js -> script.<digest>.js"""
+    stem, extension = os.path.splitext(name)
+    return f'{stem}.{digest[:10]}{extension}'
+
+class AssetManifest:
+    """In-memory manifest of the SPA's static files, built once per process.
+
+    JS and CSS are also published under fingerprinted names, which
+    index.html is rewritten to reference, so they can be cached forever
+    while index.html itself is revalidated.
+    """
+
+    def __init__(self):
+        self.folder = None
+        self.reload = False
+        self._assets = None
+        self._mtimes = {}
+        self._lock = Lock()
+
+    def init_app(self, app):
+        self.folder = app.static_folder
+        # In debug mode edits are picked up without a restart, at the cost of a stat per request
+        self.reload = app.debug or app.config.get('ASSET_RELOAD', False)
+        # Built by the first request rather than at boot, since Brotli at quality 11 is slow
+        self._assets = None
+
+    def _scan(self):
+        files = {}
+        for root, dirs, names in os.walk(self.folder):
+            dirs[:] = [d for d in dirs if os.path.relpath(os.path.join(root, d), self.folder) not in EXCLUDED_DIRS]
+            for name in names:
+                path = os.path.join(root, name)
+                files[os.path.relpath(path, self.folder).replace(os.sep, '/')] = os.path.getmtime(path)
+        return files
+
+    def build(self):
+        """Read, fingerprint and compress every static file"""
+        mtimes = self._scan()
+        assets, renames = {}, {}
+        for name in mtimes:
+            if name == 'index.html':
+                continue
+            with open(os.path.join(self.folder, name), 'rb') as f:
+                body = f.read()
+            content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            assets[name] = Asset(body, content_type)
+            if os.path.splitext(name)[1] in FINGERPRINTED_EXTENSIONS:
+                hashed = fingerprinted_name(name, assets[name].digest)
+                assets[hashed] = assets[name].fingerprinted()
+                renames[name] = hashed
+
+        if 'index.html' in mtimes:
+            with open(os.path.join(self.folder, 'index.html'), encoding='utf-8') as f:
+                html = f.read()
+            for name, hashed in renames.items():
+                html = re.sub(rf'(src|href)="/?{re.escape(name)}"', rf'\1="/{hashed}"', html)
+            assets['index.html'] = Asset(html.encode('utf-8'), 'text/html; charset=utf-8')
+
+        self._assets = assets
+        self._mtimes = mtimes
+
+    def get(self, name):
+        if self._assets is None or (self.reload and self._scan() != self._mtimes):
+            with self._lock:
+                if self._assets is None or self.reload:
+                    self.build()
+        return self._assets.get(name)
+
+    def response(self, app, asset):
+        """Build the response for an asset, honoring Accept-Encoding and If-None-Match"""
+        encoding = asset.negotiate(request.accept_encodings)
+        response = app.response_class(asset.variants[encoding], content_type=asset.content_type)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.set_etag(f'{asset.digest}-{encoding}')
+        if asset.immutable:
+            response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+        else:
+            response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+
+asset_manifest = AssetManifest()
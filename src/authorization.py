@@ -0,0 +1,95 @@
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+import time
+from flask import g, jsonify
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
+from src.models.user import User, ROLE_HIERARCHY, db
+
+# How long a cached user record is trusted before it is re-read
+AUTH_CACHE_TTL = 30
+AUTH_CACHE_SIZE = 4096
+
+class UserCache:
+    """Per-process TTL/LRU cache of the user fields authorization depends on"""
+
+    def __init__(self, ttl=AUTH_CACHE_TTL, maxsize=AUTH_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, user_id):
+        """Return (token_version, is_active) for a user, reading the database on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                return entry[1]
+
+        row = db.session.query(User.token_version, User.is_active).filter(User.id == user_id).first()
+        record = (row.token_version, row.is_active) if row else None
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl, record)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return record
+
+    def invalidate(self, user_id):
+        """Drop a user's cached record so the next request re-reads it"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+user_cache = UserCache()
+
+class Principal:
+    """The authenticated caller, built from verified token claims"""
+
+    def __init__(self, user_id, role):
+        self.id = user_id
+        self.role = role
+
+    def __repr__(self):
+        return f'<Principal {self.id} {self.role}>'
+
+    def has_role(self, role):
+        """Check if the caller has a specific role or higher"""
+        return ROLE_HIERARCHY.get(self.role, 0) >= ROLE_HIERARCHY.get(role, 0)
+
+def current_principal():
+    """Return the caller authorized by the enclosing @authorize decorator"""
+    return g.principal
+
+def authorize(role=None):
+    """Require a valid access token, checked against the cached user version, and optionally a minimum role"""
+    def decorator(fn):
+        @wraps(fn)
+        @jwt_required()
+        def wrapper(*args, **kwargs):
+            claims = get_jwt()
+            user_id = int(get_jwt_identity())
+            record = user_cache.get(user_id)
+
+            if not record:
+                return jsonify({'error': 'User not found'}), 404
+
+            token_version, is_active = record
+            if not is_active:
+                return jsonify({'error': 'Account is deactivated'}), 401
+            if claims.get('ver') != token_version:
+                return jsonify({'error': 'Token has been revoked'}), 401
+
+            principal = Principal(user_id, claims.get('role'))
+            if role and not principal.has_role(role):
+                return jsonify({'error': 'Insufficient permissions'}), 403
+
+            g.principal = principal
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,63 @@
+import os
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from src.models.user import User, db
+from src.models.task import Task, TaskStats
+from src.migrations import upgrade
+
+DEFAULT_ADMIN = {
+    'username': 'admin',
+    'email': 'admin@boehmtech.com',
+    'password': 'admin123',
+    'display_name': 'Boehm Tech Administrator',
+}
+
+def init_db():
+    """Create the schema, apply pending migrations and prepare the upload folder; returns the applied migrations"""
+    applied = upgrade()
+
+    # Backfill the dashboard counters for databases created before they existed
+    if not TaskStats.query.first() and Task.query.first():
+        TaskStats.rebuild()
+
+    os.makedirs(current_app.config['UPLOAD_FOLDER'], exist_ok=True)
+    return applied
+
+def seed_admin(username=DEFAULT_ADMIN['username'], email=DEFAULT_ADMIN['email'],
+               password=DEFAULT_ADMIN['password'], display_name=DEFAULT_ADMIN['display_name']):
+    """Create the superadmin account unless it exists; returns it, or None if it already existed"""
+    if User.query.filter_by(username=username).first():
+        return None
+    superadmin = User.create_user(
+        username=username,
+        email=email,
+        password=password,
+        display_name=display_name,
+        role='superadmin'
+    )
+    db.session.add(superadmin)
+    db.session.commit()
+    return superadmin
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create the database schema and apply pending migrations."""
+    applied = init_db()
+    for version, description in applied:
+        click.echo(f'Applied {version:04d}: {description}')
+    click.echo('Database schema is up to date')
+
+@click.command('seed-admin')
+@click.option('--username', default=DEFAULT_ADMIN['username'], show_default=True)
+@click.option('--email', default=DEFAULT_ADMIN['email'], show_default=True)
+@click.option('--password', default=DEFAULT_ADMIN['password'], show_default=True)
+@click.option('--display-name', default=DEFAULT_ADMIN['display_name'], show_default=True)
+@with_appcontext
+def seed_admin_command(username, email, password, display_name):
+    """Create the superadmin account if it does not exist."""
+    if seed_admin(username, email, password, display_name) is None:
+        click.echo(f"User '{username}' already exists")
+    else:
+        click.echo(f"Superadmin created: username='{username}'")
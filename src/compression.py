@@ -0,0 +1,178 @@
+import time
+import zlib
+from flask import current_app, request
+from src.assets import COMPRESSIBLE_TYPES, brotli
+from src.metrics import metrics
+
+# Smallest buffered body worth compressing; below this the headers cost more than is saved
+COMPRESSION_MIN_SIZE = 1024
+
+# Named trade-offs between CPU time and bytes on the wire, as (gzip level, Brotli quality)
+COMPRESSION_PROFILES = {
+    'fast': (1, 1),
+    'balanced': (6, 4),
+    'small': (9, 9),
+}
+
+# Compressible besides COMPRESSIBLE_TYPES: streamed exports
+STREAMED_TYPES = ('application/x-ndjson',)
+# Each event must reach the client when it is sent, which a compressor's buffer would delay
+UNCOMPRESSED_TYPES = ('text/event-stream',)
+
+class CompressionPolicy:
+    """Per-route compression settings attached to a view by @compress"""
+
+    def __init__(self, profile=None, min_size=None, enabled=True):
+        if profile is not None and profile not in COMPRESSION_PROFILES:
+            raise ValueError(f'Unknown compression profile {profile!r}')
+        self.profile = profile
+        self.min_size = min_size
+        self.enabled = enabled
+
+def compress(profile=None, min_size=None):
+    """Set how a route's responses are compressed; compress(False) opts the route out.
+
+    profile names an entry of COMPRESSION_PROFILES: 'fast' for large or
+    streamed responses where CPU matters more than bytes, 'small' for
+    responses that are read often over slow links.
+    """
+    if profile is False:
+        policy = CompressionPolicy(enabled=False)
+    else:
+        policy = CompressionPolicy(profile, min_size)
+
+    def decorator(fn):
+        fn.compression_policy = policy
+        return fn
+    return decorator
+
+class Encoder:
+    """Incremental gzip or Brotli compressor that records its input, output and CPU time"""
+
+    def __init__(self, encoding, levels):
+        gzip_level, brotli_quality = levels
+        self.encoding = encoding
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=brotli_quality)
+            self._process, self._finish = compressor.process, compressor.finish
+        else:
+            # wbits 31 writes the gzip header and trailer
+            compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+            self._process, self._finish = compressor.compress, compressor.flush
+        self.input_bytes = self.output_bytes = 0
+        self.cpu_seconds = 0.0
+
+    def _timed(self, fn, *args):
+        started = time.thread_time()
+        data = fn(*args)
+        self.cpu_seconds += time.thread_time() - started
+        self.output_bytes += len(data)
+        return data
+
+    def process(self, chunk):
+        self.input_bytes += len(chunk)
+        return self._timed(self._process, chunk)
+
+    def finish(self):
+        return self._timed(self._finish)
+
+class ResponseCompressor:
+    """Opt-in gzip/Brotli compression of API responses, negotiated from Accept-Encoding.
+
+    Buffered responses are compressed when they reach min_size bytes;
+    streamed ones (exports) are compressed chunk by chunk as they are sent.
+    Files passed through to the server (uploads), responses that already
+    carry a Content-Encoding (static assets) and image types other than
+    SVG are left alone. Every compressed response is reported to
+    src.metrics with its byte counts and CPU time.
+    """
+
+    def __init__(self):
+        self.min_size = COMPRESSION_MIN_SIZE
+        self.profile = 'balanced'
+
+    def init_app(self, app):
+        if not app.config.get('COMPRESS_RESPONSES'):
+            return
+        self.min_size = app.config.get('COMPRESSION_MIN_SIZE', COMPRESSION_MIN_SIZE)
+        self.profile = app.config.get('COMPRESSION_PROFILE', 'balanced')
+        if self.profile not in COMPRESSION_PROFILES:
+            raise ValueError(f'Unknown COMPRESSION_PROFILE {self.profile!r}')
+        app.after_request(self.compress_response)
+
+    def policy(self):
+        view = current_app.view_functions.get(request.endpoint)
+        return getattr(view, 'compression_policy', None) or CompressionPolicy()
+
+    def negotiate(self):
+        """The accepted encoding with the highest quality, Brotli on a tie"""
+        accepted = request.accept_encodings
+        best, best_quality = None, 0
+        for encoding in ('br', 'gzip'):
+            if encoding == 'br' and brotli is None:
+                continue
+            quality = accepted[encoding]
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def eligible(self, response):
+        if request.method == 'HEAD' or response.status_code < 200 or response.status_code in (204, 206, 304):
+            return False
+        if response.direct_passthrough or 'Content-Encoding' in response.headers \
+                or 'Content-Range' in response.headers:
+            return False
+        mimetype = response.mimetype or ''
+        if mimetype.startswith(UNCOMPRESSED_TYPES):
+            return False
+        return mimetype.startswith(COMPRESSIBLE_TYPES + STREAMED_TYPES)
+
+    def compress_response(self, response):
+        if not self.eligible(response):
+            return response
+        policy = self.policy()
+        if not policy.enabled:
+            return response
+        # Caches must keep the variants apart even when this client got the plain body
+        response.vary.add('Accept-Encoding')
+        encoding = self.negotiate()
+        if encoding is None:
+            return response
+        min_size = self.min_size if policy.min_size is None else policy.min_size
+        if not response.is_streamed and response.content_length is not None \
+                and response.content_length < min_size:
+            return response
+
+        encoder = Encoder(encoding, COMPRESSION_PROFILES[policy.profile or self.profile])
+        key = metrics.request_key()
+        if response.is_streamed:
+            response.response = self._stream(response.response, encoder, key)
+            response.headers.pop('Content-Length', None)
+        else:
+            response.set_data(encoder.process(response.get_data()) + encoder.finish())
+            metrics.record_compression(key, encoding, encoder.input_bytes, encoder.output_bytes,
+                                       encoder.cpu_seconds)
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # A strong tag promises identical bytes, which the plain and compressed bodies are not
+            response.set_etag(f'{etag}-{encoding}')
+        return response
+
+    def _stream(self, chunks, encoder, key):
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                # Compressors buffer small chunks; nothing is sent until a block is ready
+                data = encoder.process(chunk)
+                if data:
+                    yield data
+            yield encoder.finish()
+            metrics.record_compression(key, encoder.encoding, encoder.input_bytes, encoder.output_bytes,
+                                       encoder.cpu_seconds)
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+response_compressor = ResponseCompressor()
@@ -0,0 +1,42 @@
+from functools import wraps
+import hashlib
+import time
+from flask import request, make_response
+from src.authorization import current_principal
+from src.models.change import ChangeStamp
+
+def etag_for(scopes, max_age=None):
+    """Build a weak ETag from the scope versions, the caller and the request URL.
+
+    With max_age the tag also rolls over every max_age seconds, for responses
+    that depend on the clock (such as overdue counts).
+    """
+    versions = ChangeStamp.current()
+    principal = current_principal()
+    parts = [f'{scope}:{versions.get(scope, 0)}' for scope in scopes]
+    parts += [f'{principal.id}:{principal.role}', request.full_path]
+    if max_age:
+        parts.append(str(int(time.time() // max_age)))
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+def conditional(*scopes, max_age=None):
+    """Answer If-None-Match with 304 before the view runs, and tag successful responses.
+
+    Must be applied below @authorize, since the tag depends on the caller.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            etag = etag_for(scopes, max_age)
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(fn(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            # Browsers may keep the response but must revalidate before reuse
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
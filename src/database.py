@@ -0,0 +1,119 @@
+from functools import wraps
+import logging
+import os
+import random
+import sqlite3
+import time
+from flask import current_app, g, has_app_context, jsonify
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import OperationalError
+from src.models.user import db
+
+logger = logging.getLogger(__name__)
+
+# Applied to every new SQLite connection. WAL lets readers run alongside the
+# single writer, and NORMAL only syncs at checkpoints, which is still safe in WAL mode
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # negative values are KiB
+    'temp_store': 'MEMORY',
+}
+SQLITE_BUSY_TIMEOUT_MS = 5000
+
+# A transaction that still finds the database locked after the busy timeout
+# is retried from the start, sleeping about LOCK_RETRY_DELAY * 2^attempt
+LOCK_RETRIES = 3
+LOCK_RETRY_DELAY = 0.05
+
+# Serialization failure and deadlock on server databases
+SERVER_RETRY_CODES = {'40001', '40P01'}
+
+def database_uri(default_path):
+    """DATABASE_URL when set, otherwise the SQLite file at default_path"""
+    url = os.environ.get('DATABASE_URL')
+    if not url:
+        return f'sqlite:///{default_path}'
+    # Hosting platforms still hand out the scheme SQLAlchemy 1.4 dropped
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+def engine_options(uri, busy_timeout_ms=SQLITE_BUSY_TIMEOUT_MS):
+    """SQLALCHEMY_ENGINE_OPTIONS for a database URI"""
+    if make_url(uri).get_backend_name() == 'sqlite':
+        # The driver's own busy handler, in seconds; the busy_timeout PRAGMA sets the same value
+        return {'connect_args': {'timeout': busy_timeout_ms / 1000}}
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': True,
+    }
+
+def set_sqlite_pragmas(pragmas):
+    """Connect listener applying PRAGMAs to each new SQLite connection"""
+    def listener(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+    return listener
+
+def init_database(app):
+    """Configure the engine from the app config and bind db to the app"""
+    app.config.setdefault('SQLITE_BUSY_TIMEOUT', SQLITE_BUSY_TIMEOUT_MS)
+    app.config.setdefault('SQLITE_PRAGMAS', SQLITE_PRAGMAS)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(
+        app.config['SQLALCHEMY_DATABASE_URI'], app.config['SQLITE_BUSY_TIMEOUT']
+    ))
+    db.init_app(app)
+
+    pragmas = {**app.config['SQLITE_PRAGMAS'], 'busy_timeout': app.config['SQLITE_BUSY_TIMEOUT']}
+    with app.app_context():
+        event.listen(db.engine, 'connect', set_sqlite_pragmas(pragmas))
+
+def is_lock_error(error):
+    """Whether a DBAPI error means another transaction held the lock"""
+    if isinstance(error, sqlite3.OperationalError):
+        return 'locked' in str(error) or 'busy' in str(error)
+    return getattr(error, 'pgcode', None) in SERVER_RETRY_CODES
+
+@event.listens_for(Engine, 'handle_error')
+def record_lock_error(context):
+    # Views turn exceptions into error responses, so retry_on_lock learns of the lock from here
+    if has_app_context() and is_lock_error(context.original_exception):
+        g.database_locked = True
+
+def retry_on_lock(view):
+    """Re-run a writing view from a clean session when it fails on lock contention.
+
+    Place it below @authorize; the view must not have side effects outside
+    the database that are unsafe to repeat.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        retries = current_app.config.get('DB_LOCK_RETRIES', LOCK_RETRIES)
+        for attempt in range(retries + 1):
+            g.database_locked = False
+            try:
+                result = view(*args, **kwargs)
+            except OperationalError as e:
+                if not is_lock_error(e.orig):
+                    raise
+            else:
+                if not g.database_locked:
+                    return result
+            db.session.rollback()
+            if attempt < retries:
+                delay = LOCK_RETRY_DELAY * 2 ** attempt * random.uniform(0.5, 1.5)
+                logger.info('Database locked in %s, retrying in %.0f ms', view.__name__, delay * 1000)
+                time.sleep(delay)
+        logger.warning('Database still locked in %s after %d retries', view.__name__, retries)
+        return jsonify({'error': 'Server is busy, please try again'}), 503, {'Retry-After': '1'}
+    return wrapper
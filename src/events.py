@@ -0,0 +1,218 @@
+from datetime import datetime, timedelta
+from threading import Lock, Thread
+import json
+import logging
+import queue
+import time
+from src.models.user import db
+from src.models.task import Task, TaskUpdate
+from src.models.event import TaskEvent
+
+logger = logging.getLogger(__name__)
+
+# How often each worker reads new events from the shared log
+EVENT_POLL_INTERVAL = 1.0
+# Events buffered per subscriber before it is told to resync
+EVENT_QUEUE_SIZE = 100
+# Largest number of events read or replayed at once
+EVENT_BATCH_SIZE = 500
+# Events older than this are pruned from the log
+EVENT_RETENTION = timedelta(hours=1)
+EVENT_PRUNE_INTERVAL = 300
+
+# A comment line keeps idle connections (and proxies) from timing out
+KEEPALIVE_INTERVAL = 15
+# Streams are closed periodically so clients reconnect and re-authenticate
+STREAM_MAX_AGE = 300
+RETRY_MS = 3000
+
+RESYNC_MESSAGE = 'event: resync\ndata: {}\n\n'
+
+def format_message(event_id, kind, data):
+    return f'id: {event_id}\nevent: {kind}\ndata: {data}\n\n'
+
+class Event:
+    """A logged task change with its payload serialized once for all subscribers"""
+
+    def __init__(self, event_id, kind, task_id, data, assignee_uid, previous_assignee_uid=None):
+        self.id = event_id
+        self.kind = kind
+        self.task_id = task_id
+        self.assignee_uid = assignee_uid
+        self.previous_assignee_uid = previous_assignee_uid
+        self.message = format_message(event_id, kind, json.dumps(data))
+
+    def message_for(self, principal):
+        """The SSE message for a subscriber, or None if the task is not visible to them"""
+        if principal.has_role('admin') or self.assignee_uid == principal.id:
+            return self.message
+        if self.previous_assignee_uid == principal.id:
+            # Reassigned away from this user, so it leaves their list
+            return format_message(self.id, 'task_deleted', json.dumps({'id': self.task_id}))
+        return None
+
+def load_events(after, limit=EVENT_BATCH_SIZE):
+    """Read up to limit events after an id; returns (events, last id read)"""
+    rows = TaskEvent.query.filter(TaskEvent.id > after).order_by(TaskEvent.id).limit(limit).all()
+    if not rows:
+        return [], after
+
+    # Current task and update rows for the whole batch, one query each
+    task_ids = {row.task_id for row in rows if row.kind != 'task_deleted'}
+    update_ids = {row.update_id for row in rows if row.update_id}
+    tasks = {
+        task.id: task for task in Task.query.options(*Task.eager_users()).filter(Task.id.in_(task_ids))
+    } if task_ids else {}
+    updates = {
+        update.id: update for update in TaskUpdate.query.options(*TaskUpdate.eager_users())
+        .filter(TaskUpdate.id.in_(update_ids))
+    } if update_ids else {}
+
+    events = []
+    for row in rows:
+        if row.kind == 'task_deleted':
+            events.append(Event(row.id, row.kind, row.task_id, {'id': row.task_id}, row.assignee_uid))
+            continue
+        task = tasks.get(row.task_id)
+        if task is None:
+            # Deleted since; its task_deleted event follows
+            continue
+        if row.kind == 'task_update_added':
+            update = updates.get(row.update_id)
+            if update is None:
+                continue
+            data = {'task_id': task.id, 'update': update.to_dict()}
+        else:
+            data = task.to_dict()
+        events.append(Event(row.id, row.kind, row.task_id, data, task.assignee_uid, row.previous_assignee_uid))
+    return events, rows[-1].id
+
+class Subscriber:
+    """One open event stream with a bounded queue of pending messages"""
+
+    def __init__(self, principal, start, maxsize):
+        self.principal = principal
+        self.start = start  # id of the last event not delivered through the queue
+        self.queue = queue.Queue(maxsize)
+
+    def offer(self, message):
+        """Queue a message; on overflow replace the backlog with a resync and return False"""
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except queue.Full:
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            self.queue.put_nowait(RESYNC_MESSAGE)
+            return False
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+class EventHub:
+    """Per-process fan-out of the shared task event log to open streams.
+
+    Every worker runs one poller thread reading the log written by all
+    workers, so database reads do not grow with the number of subscribers.
+    """
+
+    def __init__(self, poll_interval=EVENT_POLL_INTERVAL, queue_size=EVENT_QUEUE_SIZE):
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self._app = None
+        self._subscribers = set()
+        self._cursor = None
+        self._thread = None
+        self._lock = Lock()
+
+    def init_app(self, app):
+        self._app = app
+
+    def subscribe(self, principal):
+        """Register a stream; it receives every event after its start id"""
+        with self._lock:
+            if self._cursor is None:
+                self._cursor = db.session.query(db.func.max(TaskEvent.id)).scalar() or 0
+            subscriber = Subscriber(principal, self._cursor, self.queue_size)
+            self._subscribers.add(subscriber)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = Thread(target=self._run, name='event-hub', daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def replay(self, subscriber, last_event_id):
+        """Messages a reconnecting client missed, or a single resync when they are gone"""
+        if last_event_id >= subscriber.start:
+            return []
+        oldest = db.session.query(db.func.min(TaskEvent.id)).scalar()
+        if oldest is None or oldest > last_event_id + 1:
+            return [RESYNC_MESSAGE]
+        events, last_id = load_events(last_event_id, EVENT_BATCH_SIZE)
+        if last_id < subscriber.start:
+            return [RESYNC_MESSAGE]
+        messages = [event.message_for(subscriber.principal) for event in events if event.id <= subscriber.start]
+        return [message for message in messages if message]
+
+    def stream(self, subscriber, replay=()):
+        """Yield SSE text for a subscriber until it disconnects or the stream ages out"""
+        try:
+            yield f'retry: {RETRY_MS}\n\n'
+            for message in replay:
+                yield message
+                if message is RESYNC_MESSAGE:
+                    return
+            deadline = time.monotonic() + STREAM_MAX_AGE
+            while time.monotonic() < deadline:
+                message = subscriber.get(KEEPALIVE_INTERVAL)
+                if message is None:
+                    yield ': keepalive\n\n'
+                    continue
+                yield message
+                if message is RESYNC_MESSAGE:
+                    return
+        finally:
+            self.unsubscribe(subscriber)
+
+    def _run(self):
+        last_prune = 0
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                if not self._subscribers:
+                    # Nobody is listening; the next subscriber starts from the log head
+                    self._cursor = None
+                    continue
+                cursor = self._cursor
+
+            try:
+                with self._app.app_context():
+                    events, last_id = load_events(cursor)
+                    if time.monotonic() - last_prune > EVENT_PRUNE_INTERVAL:
+                        TaskEvent.prune(datetime.utcnow() - EVENT_RETENTION)
+                        last_prune = time.monotonic()
+            except Exception:
+                logger.exception('Reading task events failed')
+                continue
+
+            with self._lock:
+                if self._cursor != cursor:
+                    continue
+                self._cursor = last_id
+                for subscriber in list(self._subscribers):
+                    for event in events:
+                        message = event.message_for(subscriber.principal)
+                        if message and not subscriber.offer(message):
+                            self._subscribers.discard(subscriber)
+                            break
+
+event_hub = EventHub()
@@ -0,0 +1,90 @@
+import csv
+import io
+import json
+from src.models.user import User, db
+from src.models.task import Task, TaskUpdate
+
+# Rows fetched from the database per round trip while streaming
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+TASK_EXPORT_COLUMNS = [
+    'id', 'title', 'description', 'status', 'priority', 'due_date', 'created_at', 'updated_at',
+    'assignee_uid', 'assignee', 'created_by_uid', 'creator'
+]
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+def iter_task_batches(criteria, include_updates=False):
+    """Yield export rows in batches, reading tasks with a server-side cursor"""
+    # Names are looked up from one small map instead of joining per row
+    names = dict(db.session.query(User.id, User.display_name).all())
+
+    statement = db.select(Task.__table__).where(*criteria).order_by(Task.id) \
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    for partition in db.session.execute(statement).partitions():
+        rows = [{
+            'id': task.id,
+            'title': task.title,
+            'description': task.description,
+            'status': task.status,
+            'priority': task.priority,
+            'due_date': _isoformat(task.due_date),
+            'created_at': _isoformat(task.created_at),
+            'updated_at': _isoformat(task.updated_at),
+            'assignee_uid': task.assignee_uid,
+            'assignee': names.get(task.assignee_uid),
+            'created_by_uid': task.created_by_uid,
+            'creator': names.get(task.created_by_uid)
+        } for task in partition]
+
+        if include_updates:
+            # One query for all updates of the batch
+            updates = {}
+            update_rows = db.session.execute(
+                db.select(TaskUpdate.__table__)
+                .where(TaskUpdate.task_id.in_([row['id'] for row in rows]))
+                .order_by(TaskUpdate.task_id, TaskUpdate.created_at)
+            )
+            for update in update_rows:
+                updates.setdefault(update.task_id, []).append({
+                    'id': update.id,
+                    'comment': update.comment,
+                    'url': update.url,
+                    'screenshot_path': update.screenshot_path,
+                    'created_at': _isoformat(update.created_at),
+                    'updated_by_uid': update.updated_by_uid,
+                    'author': names.get(update.updated_by_uid)
+                })
+            for row in rows:
+                row['updates'] = updates.get(row['id'], [])
+
+        yield rows
+
+def stream_tasks(criteria, fmt, include_updates=False):
+    """Yield the export body in chunks of one batch each"""
+    if fmt == 'csv':
+        columns = TASK_EXPORT_COLUMNS + (['updates'] if include_updates else [])
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns)
+        writer.writeheader()
+        for rows in iter_task_batches(criteria, include_updates):
+            for row in rows:
+                if include_updates:
+                    row['updates'] = json.dumps(row['updates'])
+                writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        # Header only when there are no rows
+        if buffer.tell():
+            yield buffer.getvalue()
+    else:
+        for rows in iter_task_batches(criteria, include_updates):
+            yield ''.join(json.dumps(row) + '\n' for row in rows)
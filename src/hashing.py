@@ -0,0 +1,88 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from threading import BoundedSemaphore, Lock
+import os
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Defaults, overridable through the PASSWORD_HASH_* config keys
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 16
+DEFAULT_ACQUIRE_TIMEOUT = 0.1
+
+class HashingBusy(Exception):
+    """Raised when the password hashing pool has no free slot.
+
+    The app answers it with 503 and Retry-After; views that turn every
+    exception into a 500 re-raise it first.
+    """
+
+class PasswordHasher:
+    """Runs password hashing on a size-bounded worker pool off the request thread"""
+
+    def __init__(self):
+        self.method = DEFAULT_METHOD
+        self.workers = DEFAULT_WORKERS
+        self.queue_size = DEFAULT_QUEUE_SIZE
+        self.acquire_timeout = DEFAULT_ACQUIRE_TIMEOUT
+        self.pool_type = 'thread'
+        self._executor = None
+        self._slots = None
+        self._pid = None
+        self._method_prefix = None
+        self._lock = Lock()
+
+    def init_app(self, app):
+        """Read pool size and work factor from the app config"""
+        self.method = app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', DEFAULT_WORKERS)
+        self.queue_size = app.config.get('PASSWORD_HASH_QUEUE_SIZE', DEFAULT_QUEUE_SIZE)
+        self.acquire_timeout = app.config.get('PASSWORD_HASH_ACQUIRE_TIMEOUT', DEFAULT_ACQUIRE_TIMEOUT)
+        self.pool_type = app.config.get('PASSWORD_HASH_POOL', 'thread')
+        self._method_prefix = None
+        self.shutdown()
+
+    def _ensure_pool(self):
+        # Created lazily, and again after a fork, since worker threads do not survive fork()
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                executor_class = ProcessPoolExecutor if self.pool_type == 'process' else ThreadPoolExecutor
+                self._executor = executor_class(max_workers=self.workers)
+                self._slots = BoundedSemaphore(self.workers + self.queue_size)
+                self._pid = os.getpid()
+            return self._executor, self._slots
+
+    def _run(self, fn, *args):
+        executor, slots = self._ensure_pool()
+        if not slots.acquire(timeout=self.acquire_timeout):
+            raise HashingBusy('Password hashing pool is saturated')
+        try:
+            future = executor.submit(fn, *args)
+        except Exception:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        return future.result()
+
+    def hash(self, password):
+        """Hash a password with the configured method"""
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        """Check a password against a stored hash"""
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """Check if a stored hash was made with a different method or work factor"""
+        if self._method_prefix is None:
+            # Werkzeug fills in default parameters, so hash once to learn the full prefix
+            self._method_prefix = self.hash('').split('$', 1)[0]
+        return pwhash.split('$', 1)[0] != self._method_prefix
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False)
+            self._executor = None
+            self._slots = None
+
+password_hasher = PasswordHasher()
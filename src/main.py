@@ -3,111 +3,206 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory, jsonify
+from flask import Flask, jsonify
 
 
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
+from werkzeug.utils import import_string
 from datetime import timedelta
 
-# Import models
+# Import models; their flush listeners maintain the derived tables
+from src.hashing import HashingBusy, password_hasher
 from src.models.user import db
-from src.models.task import Task, TaskUpdate
-
-# Import routes
-from src.routes.user import user_bp
-from src.routes.auth import auth_bp
-from src.routes.task import task_bp
-
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-
-# Configuration
-app.config['SECRET_KEY'] = 'boehm-tech-secret-key-2024'
-app.config['JWT_SECRET_KEY'] = 'boehm-tech-jwt-secret-2024'
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
-app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=30)
-
-# Enable CORS for all routes
-CORS(app, origins="*", allow_headers=["Content-Type", "Authorization"])
-
-# Initialize JWT
-jwt = JWTManager(app)
-
-# JWT Error Handlers
-@jwt.expired_token_loader
-def expired_token_callback(jwt_header, jwt_payload):
-    return jsonify({'error': 'Token has expired'}), 401
-
-@jwt.invalid_token_loader
-def invalid_token_callback(error):
-    return jsonify({'error': 'Invalid token'}), 401
-
-@jwt.unauthorized_loader
-def missing_token_callback(error):
-    return jsonify({'error': 'Authorization token is required'}), 401
-
-# Register blueprints
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(task_bp, url_prefix='/api')
-
-# Database configuration
-if os.environ.get("RENDER"):
-    db_path = "/tmp/app.db"
-else:
-    db_path = os.path.join(os.path.dirname(__file__), 'database', 'app.db')
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-
-# Create upload directory for screenshots
-upload_dir = os.path.join(os.path.dirname(__file__), 'static', 'uploads')
-os.makedirs(upload_dir, exist_ok=True)
-
-with app.app_context():
-    db.create_all()
-    
-    # Create default superadmin user if it doesn't exist
-    from src.models.user import User
-    superadmin = User.query.filter_by(username='admin').first()
-    if not superadmin:
-        superadmin = User.create_user(
-            username='admin',
-            email='admin@boehmtech.com',
-            password='admin123',
-            display_name='Boehm Tech Administrator',
-            role='superadmin'
-        )
-        db.session.add(superadmin)
-        db.session.commit()
-        print("Default superadmin created: username='admin', password='admin123'")
-
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-        return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
+from src.models.task import Task, TaskUpdate, TaskStats
+from src.models.change import ChangeStamp
+from src.models.event import TaskEvent
+from src.models.upload import UploadBlob
+from src.events import event_hub
+from src.database import database_uri, init_database
+
+# Import schema management
+from src.migrations import db_upgrade_command, db_version_command, explain_queries_command
+from src.bootstrap import init_db, seed_admin, init_db_command, seed_admin_command
+from src.seed import seed_data_command
+from src.uploads import UploadRequest, reap_uploads_command
+from src.thumbnails import thumbnail_worker, thumbnails_command
+from src.assets import asset_manifest
+from src.metrics import metrics
+from src.compression import response_compressor
+from src.json_provider import FastJSONProvider
+
+# Blueprints as (import path, URL prefix); the route modules are imported by create_app
+BLUEPRINTS = [
+    ('src.routes.auth:auth_bp', '/api/auth'),
+    ('src.routes.user:user_bp', '/api'),
+    ('src.routes.task:task_bp', '/api'),
+    ('src.routes.uploads:uploads_bp', None),
+    ('src.routes.metrics:metrics_bp', None),
+]
+
+STATIC_FOLDER = os.path.join(os.path.dirname(__file__), 'static')
+
+def default_config():
+    """Configuration read from the environment"""
+    if os.environ.get("RENDER"):
+        db_path = "/tmp/app.db"
     else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
+        db_path = os.path.join(os.path.dirname(__file__), 'database', 'app.db')
+
+    config = {
+        'SECRET_KEY': 'boehm-tech-secret-key-2024',
+        'JWT_SECRET_KEY': 'boehm-tech-jwt-secret-2024',
+        'JWT_ACCESS_TOKEN_EXPIRES': timedelta(hours=24),
+        'JWT_REFRESH_TOKEN_EXPIRES': timedelta(days=30),
+
+        # Password hashing runs on a bounded worker pool
+        'PASSWORD_HASH_METHOD': os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1'),
+        'PASSWORD_HASH_WORKERS': int(os.environ.get('PASSWORD_HASH_WORKERS', 2)),
+        'PASSWORD_HASH_QUEUE_SIZE': int(os.environ.get('PASSWORD_HASH_QUEUE_SIZE', 16)),
+
+        # DATABASE_URL selects a server database instead of SQLite
+        'SQLALCHEMY_DATABASE_URI': database_uri(db_path),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'SQLITE_BUSY_TIMEOUT': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+        'DB_LOCK_RETRIES': int(os.environ.get('DB_LOCK_RETRIES', 3)),
+        # The schema is normally created once with `flask init-db`; Render's
+        # database lives in /tmp and starts empty on every deploy
+        'INIT_DB_ON_START': os.environ.get('INIT_DB_ON_START', '1' if os.environ.get('RENDER') else '0') == '1',
+
+        # Screenshots are stored by content hash under static/uploads
+        'UPLOAD_FOLDER': os.path.join(STATIC_FOLDER, 'uploads'),
+        'MAX_CONTENT_LENGTH': int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024)),
+
+        # Hand upload bodies to the front proxy: X-Sendfile (Apache, lighttpd) or an
+        # nginx internal location prefix for X-Accel-Redirect
+        'USE_X_SENDFILE': os.environ.get('UPLOAD_X_SENDFILE', '').lower() in ('1', 'true'),
+        'UPLOAD_ACCEL_REDIRECT': os.environ.get('UPLOAD_ACCEL_REDIRECT'),
+
+        # Screenshot thumbnails are generated by background threads fed from a job table
+        'THUMBNAIL_WORKERS': int(os.environ.get('THUMBNAIL_WORKERS', 1)),
+
+        # Request metrics; workers sharing METRICS_DIR report each other's counters
+        'METRICS_DIR': os.environ.get('METRICS_DIR'),
+        'METRICS_TOKEN': os.environ.get('METRICS_TOKEN'),
+        # Requests slower than this are logged with their slowest SQL statements (0 disables)
+        'SLOW_REQUEST_MS': int(os.environ.get('SLOW_REQUEST_MS', 0)),
+
+        # gzip/Brotli for API responses; off by default, since a front proxy usually compresses
+        'COMPRESS_RESPONSES': os.environ.get('COMPRESS_RESPONSES', '').lower() in ('1', 'true'),
+        'COMPRESSION_MIN_SIZE': int(os.environ.get('COMPRESSION_MIN_SIZE', 1024)),
+        'COMPRESSION_PROFILE': os.environ.get('COMPRESSION_PROFILE', 'balanced'),
+    }
+    if os.environ.get('SQLITE_TUNING', '1') == '0':
+        # Stock SQLite journaling, for comparison in benchmarks/sqlite_mixed_load.py
+        config['SQLITE_PRAGMAS'] = {'journal_mode': 'DELETE', 'synchronous': 'FULL'}
+    return config
+
+def create_app(config=None):
+    """Build the application; config entries override the environment defaults.
+
+    Nothing here touches the database, so worker boot stays cheap; the
+    schema and the admin account are created by `flask init-db` and
+    `flask seed-admin`.
+    """
+    app = Flask(__name__, static_folder=STATIC_FOLDER)
+    # orjson when installed, the standard library otherwise
+    app.json = FastJSONProvider(app)
+    app.config.update(default_config())
+    app.config.update(config or {})
+    # Uploaded files are streamed to disk and hashed while the body is parsed
+    app.request_class = UploadRequest
+
+    # Enable CORS for all routes
+    CORS(app, origins="*", allow_headers=["Content-Type", "Authorization"])
+
+    password_hasher.init_app(app)
+    init_database(app)
+    # Per-endpoint latency and SQL counters, exposed at /metrics
+    metrics.init_app(app)
+    # Registered after metrics, so its hook runs first and /metrics counts the compressed size
+    response_compressor.init_app(app)
+    # Live task events are fanned out from the shared event log
+    event_hub.init_app(app)
+    thumbnail_worker.init_app(app)
+    # The SPA's static files are fingerprinted and precompressed on first use
+    asset_manifest.init_app(app)
+
+    register_jwt_handlers(JWTManager(app))
+
+    for import_path, url_prefix in BLUEPRINTS:
+        app.register_blueprint(import_string(import_path), url_prefix=url_prefix)
+
+    # Schema management commands
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(seed_admin_command)
+    app.cli.add_command(seed_data_command)
+    app.cli.add_command(db_upgrade_command)
+    app.cli.add_command(db_version_command)
+    app.cli.add_command(explain_queries_command)
+    app.cli.add_command(reap_uploads_command)
+    app.cli.add_command(thumbnails_command)
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        # Known assets are answered from the in-memory manifest; any other path is a client-side route
+        asset = asset_manifest.get(path) or asset_manifest.get('index.html')
+        if asset is None:
             return "index.html not found", 404
+        return asset_manifest.response(app, asset)
 
-@app.errorhandler(404)
-def not_found(error):
-    return {"error": "Resource not found"}, 404
+    @app.errorhandler(404)
+    def not_found(error):
+        return {"error": "Resource not found"}, 404
 
-@app.errorhandler(500)
-def internal_error(error):
-    return {"error": "Internal server error"}, 500
+    @app.errorhandler(413)
+    def request_too_large(error):
+        return {"error": "Upload is too large"}, 413
+
+    @app.errorhandler(HashingBusy)
+    def hashing_busy(error):
+        return {"error": "Server is busy, please try again"}, 503, {"Retry-After": "1"}
+
+    @app.errorhandler(500)
+    def internal_error(error):
+        return {"error": "Internal server error"}, 500
+
+    if app.config['INIT_DB_ON_START']:
+        with app.app_context():
+            init_db()
+            if seed_admin():
+                print("Default superadmin created: username='admin', password='admin123'")
+
+    return app
+
+def register_jwt_handlers(jwt):
+    @jwt.expired_token_loader
+    def expired_token_callback(jwt_header, jwt_payload):
+        return jsonify({'error': 'Token has expired'}), 401
+
+    @jwt.invalid_token_loader
+    def invalid_token_callback(error):
+        return jsonify({'error': 'Invalid token'}), 401
+
+    @jwt.unauthorized_loader
+    def missing_token_callback(error):
+        return jsonify({'error': 'Authorization token is required'}), 401
+
+def __getattr__(name):
+    # `src.main:app` (gunicorn, flask --app) builds the default app on first access
+    if name == 'app':
+        globals()['app'] = create_app()
+        return globals()['app']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == '__main__':
+    app = create_app()
+    # The development server sets up its own database
+    with app.app_context():
+        init_db()
+        if seed_admin():
+            print("Default superadmin created: username='admin', password='admin123'")
     # For Render deployment, use the PORT environment variable if available
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True)
-
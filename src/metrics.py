@@ -0,0 +1,274 @@
+from bisect import bisect_left
+from threading import Lock
+import atexit
+import glob
+import json
+import logging
+import os
+import tempfile
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from src.models.user import db
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# How often each process writes its counters to METRICS_DIR for the others to read
+FLUSH_INTERVAL = 5
+# Statements kept per request for the slow request log
+SLOW_LOG_STATEMENTS = 5
+SLOW_LOG_STATEMENT_CHARS = 500
+
+# name: (type, help, buckets) for every series, in exposition order
+METRICS = {
+    'http_requests_total': ('counter', 'Requests handled, by endpoint and status', None),
+    'http_request_errors_total': ('counter', 'Requests answered with a 5xx status', None),
+    'http_request_duration_seconds': ('histogram', 'Time from request start to response', LATENCY_BUCKETS),
+    'http_request_sql_queries': ('histogram', 'SQL statements executed per request', QUERY_BUCKETS),
+    'http_request_sql_duration_seconds_total': ('counter', 'Time spent executing SQL statements', None),
+    'http_response_size_bytes_total': ('counter', 'Response body bytes with a known length', None),
+    'http_responses_compressed_total': ('counter', 'Responses compressed by src/compression.py', None),
+    'http_response_compression_input_bytes_total': ('counter', 'Response bytes before compression', None),
+    'http_response_compression_output_bytes_total': ('counter', 'Response bytes after compression', None),
+    'http_response_compression_cpu_seconds_total': ('counter', 'CPU time spent compressing responses', None),
+}
+COMPRESSION_LABELS = ('method', 'endpoint', 'encoding')
+LABELS = {
+    'http_requests_total': ('method', 'endpoint', 'status'),
+    'http_responses_compressed_total': COMPRESSION_LABELS,
+    'http_response_compression_input_bytes_total': COMPRESSION_LABELS,
+    'http_response_compression_output_bytes_total': COMPRESSION_LABELS,
+    'http_response_compression_cpu_seconds_total': COMPRESSION_LABELS,
+}
+DEFAULT_LABELS = ('method', 'endpoint')
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(names, values, extra=None):
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}'
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class RequestMetrics:
+    """Per-endpoint request, SQL and latency counters with Prometheus text output.
+
+    Counters live in process memory. With METRICS_DIR set, every process
+    writes a snapshot there at most every FLUSH_INTERVAL seconds, and
+    /metrics sums the snapshots of all processes, so any worker can answer
+    a scrape. Snapshots of exited workers are kept so counters never go
+    backwards; clear the directory when deploying.
+    """
+
+    def __init__(self):
+        self.directory = None
+        self.slow_threshold = None
+        self.flush_interval = FLUSH_INTERVAL
+        self._series = {}
+        self._pid = None
+        self._flushed_at = 0
+        self._exit_flush = False
+        self._lock = Lock()
+
+    def init_app(self, app):
+        self.directory = app.config.get('METRICS_DIR')
+        slow_ms = app.config.get('SLOW_REQUEST_MS')
+        self.slow_threshold = slow_ms / 1000 if slow_ms else None
+        self.flush_interval = app.config.get('METRICS_FLUSH_INTERVAL', FLUSH_INTERVAL)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            if not self._exit_flush:
+                # Counted since the last periodic flush; lost only if the worker is killed
+                atexit.register(self.flush_on_exit)
+                self._exit_flush = True
+
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self.before_cursor_execute)
+            event.listen(db.engine, 'after_cursor_execute', self.after_cursor_execute)
+            event.listen(db.engine, 'handle_error', self.handle_error)
+
+    # Collection
+
+    def start_request(self):
+        g.metrics_started = time.perf_counter()
+        g.sql_queries = 0
+        g.sql_seconds = 0.0
+        g.sql_statements = [] if self.slow_threshold is not None else None
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # Kept on the statement's execution context, which ends with it whether it succeeds or fails
+        context._metrics_started = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self._record_statement(context, statement)
+
+    def handle_error(self, exception_context):
+        # Failed statements, such as those hitting a locked database, count toward the request too
+        context = exception_context.execution_context
+        if context is not None and hasattr(context, '_metrics_started'):
+            self._record_statement(context, exception_context.statement)
+
+    def _record_statement(self, context, statement):
+        elapsed = time.perf_counter() - context._metrics_started
+        # Statements of background threads and CLI commands belong to no request
+        if not has_request_context() or 'sql_queries' not in g:
+            return
+        g.sql_queries += 1
+        g.sql_seconds += elapsed
+        if g.sql_statements is not None:
+            g.sql_statements.append((elapsed, statement))
+
+    def finish_request(self, response):
+        if 'metrics_started' not in g:
+            return response
+        elapsed = time.perf_counter() - g.metrics_started
+        key = self.request_key()
+        with self._lock:
+            self._check_pid()
+            self._add('http_requests_total', key + (str(response.status_code),), 1)
+            if response.status_code >= 500:
+                self._add('http_request_errors_total', key, 1)
+            self._observe('http_request_duration_seconds', key, elapsed)
+            self._observe('http_request_sql_queries', key, g.sql_queries)
+            self._add('http_request_sql_duration_seconds_total', key, g.sql_seconds)
+            if response.content_length:
+                self._add('http_response_size_bytes_total', key, response.content_length)
+            flush = self.directory and time.monotonic() - self._flushed_at >= self.flush_interval
+        if flush:
+            self.flush()
+        if self.slow_threshold is not None and elapsed >= self.slow_threshold:
+            self.log_slow_request(response, elapsed)
+        return response
+
+    def record_compression(self, key, encoding, input_bytes, output_bytes, cpu_seconds):
+        """Count one compressed response; streamed ones report when their last chunk is sent"""
+        key = key + (encoding,)
+        with self._lock:
+            self._check_pid()
+            self._add('http_responses_compressed_total', key, 1)
+            self._add('http_response_compression_input_bytes_total', key, input_bytes)
+            self._add('http_response_compression_output_bytes_total', key, output_bytes)
+            self._add('http_response_compression_cpu_seconds_total', key, cpu_seconds)
+
+    @staticmethod
+    def request_key():
+        # The URL rule, not the path, so ids do not create a series each
+        return (request.method, request.url_rule.rule if request.url_rule else 'unmatched')
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            # Forked from a process whose counters are its own
+            self._series = {}
+            self._pid = os.getpid()
+
+    def _add(self, name, key, amount):
+        series = self._series.setdefault(name, {})
+        series[key] = series.get(key, 0) + amount
+
+    def _observe(self, name, key, value):
+        buckets = METRICS[name][2]
+        series = self._series.setdefault(name, {})
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = {'buckets': [0] * (len(buckets) + 1), 'sum': 0, 'count': 0}
+        histogram['buckets'][bisect_left(buckets, value)] += 1
+        histogram['sum'] += value
+        histogram['count'] += 1
+
+    def log_slow_request(self, response, elapsed):
+        statements = sorted(g.sql_statements, key=lambda item: item[0], reverse=True)[:SLOW_LOG_STATEMENTS]
+        lines = [
+            f'Slow request {request.method} {request.full_path.rstrip("?")} {response.status_code} '
+            f'in {elapsed * 1000:.0f} ms, {g.sql_queries} SQL statements ({g.sql_seconds * 1000:.0f} ms)'
+        ]
+        for duration, statement in statements:
+            lines.append(f'  {duration * 1000:8.1f} ms  {" ".join(statement.split())[:SLOW_LOG_STATEMENT_CHARS]}')
+        logger.warning('\n'.join(lines))
+
+    # Aggregation
+
+    def snapshot(self):
+        with self._lock:
+            # Histograms are copied, since they keep changing after the lock is released
+            return {
+                name: [
+                    [list(key), dict(value, buckets=list(value['buckets'])) if isinstance(value, dict) else value]
+                    for key, value in series.items()
+                ]
+                for name, series in self._series.items()
+            }
+
+    def flush(self):
+        """Write this process's counters to METRICS_DIR"""
+        self._flushed_at = time.monotonic()
+        fd, partial = tempfile.mkstemp(dir=self.directory, suffix='.part')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(partial, os.path.join(self.directory, f'metrics-{os.getpid()}.json'))
+
+    def flush_on_exit(self):
+        # Processes that never finished a request, like the CLI or a preloading master, leave no snapshot
+        if self.directory and self._pid == os.getpid():
+            self.flush()
+
+    def collect(self):
+        """Counters summed over every process sharing METRICS_DIR, or this process alone"""
+        if not self.directory:
+            snapshots = [self.snapshot()]
+        else:
+            self.flush()
+            snapshots = []
+            for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+                try:
+                    with open(path) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    # Being replaced by its process; its next snapshot is read on the next scrape
+                    continue
+
+        merged = {}
+        for snapshot in snapshots:
+            for name, entries in snapshot.items():
+                series = merged.setdefault(name, {})
+                for key, value in entries:
+                    key = tuple(key)
+                    if isinstance(value, dict):
+                        total = series.setdefault(key, {'buckets': [0] * len(value['buckets']), 'sum': 0, 'count': 0})
+                        total['buckets'] = [a + b for a, b in zip(total['buckets'], value['buckets'])]
+                        total['sum'] += value['sum']
+                        total['count'] += value['count']
+                    else:
+                        series[key] = series.get(key, 0) + value
+        return merged
+
+    def render(self):
+        """Prometheus text exposition of the collected metrics"""
+        merged = self.collect()
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            labels = LABELS.get(name, DEFAULT_LABELS)
+            for key, value in sorted(merged.get(name, {}).items()):
+                if kind == 'histogram':
+                    cumulative = 0
+                    for bound, count in zip(buckets + ('+Inf',), value['buckets']):
+                        cumulative += count
+                        le = 'le="%s"' % bound
+                        lines.append(f'{name}_bucket{format_labels(labels, key, le)} {cumulative}')
+                    lines.append(f'{name}_sum{format_labels(labels, key)} {format_value(value["sum"])}')
+                    lines.append(f'{name}_count{format_labels(labels, key)} {value["count"]}')
+                else:
+                    lines.append(f'{name}{format_labels(labels, key)} {format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+metrics = RequestMetrics()
@@ -0,0 +1,171 @@
+import click
+from flask.cli import with_appcontext
+from datetime import datetime
+from src.models.user import User, db
+from src.models.task import Task, TaskUpdate, TaskStats
+from src.models.search import create_search_index, search_tasks
+from src.models.upload import UploadBlob
+from src.models.change import ChangeStamp
+
+# Applied schema versions are recorded here
+schema_migrations = db.Table(
+    'schema_migrations',
+    db.Column('version', db.Integer, primary_key=True, autoincrement=False),
+    db.Column('description', db.String(200), nullable=False),
+    db.Column('applied_at', db.DateTime, nullable=False)
+)
+
+# Registered migrations as (version, description, function) tuples
+MIGRATIONS = []
+
+def migration(version, description):
+    """Register a schema migration that receives a connection inside a transaction"""
+    def decorator(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return decorator
+
+def create_indexes(connection, table, names):
+    """Create the named indexes declared on a model table if they are missing"""
+    for index in table.indexes:
+        if index.name in names:
+            index.create(connection, checkfirst=True)
+
+def add_columns(connection, table, names):
+    """Add the named nullable columns declared on a model table if they are missing"""
+    existing = {column['name'] for column in db.inspect(connection).get_columns(table.name)}
+    for column in table.columns:
+        if column.name in names and column.name not in existing:
+            column_type = column.type.compile(connection.dialect)
+            connection.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+@migration(1, 'Composite indexes for task and task update hot queries')
+def add_task_indexes(connection):
+    create_indexes(connection, Task.__table__, {
+        'ix_task_due_date_id',
+        'ix_task_assignee_due_date_id',
+        'ix_task_assignee_status_due_date',
+        'ix_task_created_by_created_at',
+        'ix_task_status_due_date',
+        'ix_task_open_due_date',
+    })
+    create_indexes(connection, TaskUpdate.__table__, {'ix_task_update_task_created_at'})
+
+@migration(2, 'Token version stamp on users')
+def add_user_token_version(connection):
+    connection.execute(db.text('ALTER TABLE "user" ADD COLUMN token_version INTEGER NOT NULL DEFAULT 1'))
+
+@migration(3, 'Full-text search index over tasks and update comments')
+def add_task_search(connection):
+    if connection.dialect.name == 'sqlite':
+        create_search_index(connection)
+
+@migration(4, 'Change sequence on tasks for delta sync')
+def add_task_change_seq(connection):
+    connection.execute(db.text('ALTER TABLE task ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0'))
+    create_indexes(connection, Task.__table__, {'ix_task_change_seq', 'ix_task_assignee_change_seq'})
+    # Existing tasks get distinct sequences at or below the tasks stamp, so
+    # a delta from any seq handed out later never misses them
+    connection.execute(db.text('UPDATE task SET change_seq = id'))
+    latest = connection.execute(db.select(db.func.max(Task.change_seq))).scalar()
+    if latest is not None:
+        table = ChangeStamp.__table__
+        version = connection.execute(db.select(table.c.version).where(table.c.scope == 'tasks')).scalar()
+        if version is None:
+            connection.execute(table.insert().values(scope='tasks', version=latest))
+        elif version < latest:
+            connection.execute(table.update().where(table.c.scope == 'tasks').values(version=latest))
+
+@migration(5, 'Thumbnail and preview paths on stored uploads')
+def add_upload_derivatives(connection):
+    add_columns(connection, UploadBlob.__table__, {'thumbnail_path', 'preview_path'})
+
+def applied_versions(connection):
+    """Return the set of schema versions recorded as applied"""
+    return {row.version for row in connection.execute(db.select(schema_migrations.c.version))}
+
+def upgrade():
+    """Create missing tables and apply pending migrations in version order"""
+    # A database without any tables gets the current schema from create_all,
+    # so its migrations only need to be recorded, not run
+    fresh = not db.inspect(db.engine).has_table(Task.__tablename__)
+    db.create_all()
+
+    applied = []
+    with db.engine.begin() as connection:
+        done = applied_versions(connection)
+        for version, description, fn in MIGRATIONS:
+            if version in done:
+                continue
+            if not fresh:
+                fn(connection)
+            connection.execute(schema_migrations.insert().values(
+                version=version, description=description, applied_at=datetime.utcnow()
+            ))
+            applied.append((version, description))
+    return applied
+
+def hot_queries():
+    """Statements behind the hot API endpoints, keyed by a short label"""
+    now = datetime.utcnow()
+    page_order = (Task.due_date.asc().nulls_first(), Task.id.asc())
+    return {
+        'GET /api/tasks (admin)': db.select(Task).order_by(*page_order).limit(101),
+        'GET /api/tasks (user)': db.select(Task).where(Task.assignee_uid == 1).order_by(*page_order).limit(101),
+        'GET /api/tasks?status=': db.select(Task).where(Task.status == 'pending').order_by(*page_order).limit(101),
+        'GET /api/tasks?created_by=': db.select(Task).where(Task.created_by_uid == 1).order_by(*page_order).limit(101),
+        'GET /api/tasks/<id> (updates)': db.select(TaskUpdate).where(TaskUpdate.task_id == 1)
+            .order_by(TaskUpdate.created_at.desc()),
+        'GET /api/dashboard/stats (overdue)': db.select(db.func.count(Task.id))
+            .where(Task.due_date < now, Task.is_open()),
+        'GET /api/dashboard/stats (user overdue)': db.select(db.func.count(Task.id))
+            .where(Task.assignee_uid == 1, Task.due_date < now, Task.is_open()),
+        'GET /api/dashboard/stats (counters)': db.select(db.func.sum(TaskStats.count))
+            .where(TaskStats.assignee_uid == 1),
+        'GET /api/tasks/search': search_tasks(Task.query.filter(Task.assignee_uid == 1), 'report')
+            .limit(20).statement,
+        'Task.get_tasks_by_creator': db.select(Task).where(Task.created_by_uid == 1)
+            .order_by(Task.created_at.desc()),
+        'GET /api/users': db.select(User).order_by(User.created_at.desc()),
+    }
+
+def explain(statement):
+    """Return the database's query plan for a statement as a list of lines"""
+    prefix = 'EXPLAIN QUERY PLAN ' if db.engine.dialect.name == 'sqlite' else 'EXPLAIN '
+    compiled = statement.compile(dialect=db.engine.dialect, compile_kwargs={'render_postcompile': True})
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    with db.engine.connect() as connection:
+        rows = connection.exec_driver_sql(prefix + str(compiled), params)
+        return [' '.join(str(value) for value in row) for row in rows]
+
+@click.command('db-upgrade')
+@with_appcontext
+def db_upgrade_command():
+    """Apply pending schema migrations."""
+    applied = upgrade()
+    for version, description in applied:
+        click.echo(f'Applied {version:04d}: {description}')
+    if not applied:
+        click.echo('Database schema is up to date')
+
+@click.command('db-version')
+@with_appcontext
+def db_version_command():
+    """Show applied and pending schema migrations."""
+    with db.engine.connect() as connection:
+        done = applied_versions(connection) if db.inspect(connection).has_table('schema_migrations') else set()
+    for version, description, _ in MIGRATIONS:
+        state = 'applied' if version in done else 'pending'
+        click.echo(f'{version:04d} [{state}] {description}')
+
+@click.command('explain-queries')
+@with_appcontext
+def explain_queries_command():
+    """Print the query plan of each hot endpoint query."""
+    for label, statement in hot_queries().items():
+        click.echo(label)
+        for line in explain(statement):
+            click.echo(f'    {line}')
@@ -0,0 +1,122 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from datetime import datetime
+from src.models.user import User, db
+from src.models.task import Task, TaskUpdate, previous_value
+
+class ChangeStamp(db.Model):
+    """Version counter per data scope, bumped on every write to that scope.
+
+    The bump is part of the writing transaction, so versions follow commit
+    order and the tasks version doubles as the task change sequence.
+    """
+    __tablename__ = 'change_stamps'
+
+    scope = db.Column(db.String(20), primary_key=True)  # tasks, users
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ChangeStamp {self.scope}: {self.version}>'
+
+    @staticmethod
+    def current():
+        """Return the version of every scope in one query"""
+        return dict(db.session.query(ChangeStamp.scope, ChangeStamp.version).all())
+
+    @staticmethod
+    def bump(connection, scopes):
+        """Increment the version of each scope and return the new versions"""
+        table = ChangeStamp.__table__
+        versions = {}
+        for scope in scopes:
+            version = connection.execute(
+                table.update().where(table.c.scope == scope).values(version=table.c.version + 1)
+                .returning(table.c.version)
+            ).scalar()
+            if version is None:
+                version = 1
+                connection.execute(table.insert().values(scope=scope, version=version))
+            versions[scope] = version
+        return versions
+
+class TaskTombstone(db.Model):
+    """A task that left someone's view: deleted, or reassigned away from a user"""
+    __tablename__ = 'task_tombstones'
+
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, nullable=False)
+    assignee_uid = db.Column(db.Integer, nullable=True)  # assignee the task was removed from
+    deleted = db.Column(db.Boolean, nullable=False)  # False when only reassigned
+    change_seq = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_task_tombstones_change_seq', 'change_seq'),
+        db.Index('ix_task_tombstones_assignee_change_seq', 'assignee_uid', 'change_seq'),
+    )
+
+    def __repr__(self):
+        return f'<TaskTombstone {self.task_id} at {self.change_seq}>'
+
+    @staticmethod
+    def record(connection, rows, change_seq):
+        """Insert (task_id, assignee_uid, deleted) tombstones at a change sequence"""
+        if rows:
+            now = datetime.utcnow()
+            connection.execute(TaskTombstone.__table__.insert(), [
+                {'task_id': task_id, 'assignee_uid': assignee_uid, 'deleted': deleted,
+                 'change_seq': change_seq, 'created_at': now}
+                for task_id, assignee_uid, deleted in rows
+            ])
+
+# Model classes and the scope their writes belong to
+SCOPES = {Task: 'tasks', TaskUpdate: 'tasks', User: 'users'}
+
+def _stamp_task_changes(session, change_seq):
+    """Stamp the tasks written by this flush and record tombstones for removed ones"""
+    changed, removed, tombstones = set(), set(), []
+    for obj in session.new:
+        if isinstance(obj, Task):
+            changed.add(obj.id)
+        elif isinstance(obj, TaskUpdate):
+            changed.add(obj.task_id)
+    for obj in session.dirty:
+        if isinstance(obj, Task) and session.is_modified(obj):
+            changed.add(obj.id)
+            previous = previous_value(obj, 'assignee_uid')
+            if previous is not None and previous != obj.assignee_uid:
+                tombstones.append((obj.id, previous, False))
+        elif isinstance(obj, TaskUpdate) and session.is_modified(obj):
+            changed.add(obj.task_id)
+    for obj in session.deleted:
+        if isinstance(obj, Task):
+            removed.add(obj.id)
+            tombstones.append((obj.id, previous_value(obj, 'assignee_uid'), True))
+        elif isinstance(obj, TaskUpdate):
+            changed.add(obj.task_id)
+
+    connection = session.connection()
+    changed -= removed
+    if changed:
+        table = Task.__table__
+        # Keep updated_at as written; only the sequence moves
+        connection.execute(
+            table.update().where(table.c.id.in_(changed))
+            .values(change_seq=change_seq, updated_at=table.c.updated_at)
+        )
+    TaskTombstone.record(connection, tombstones, change_seq)
+
+@event.listens_for(Session, 'after_flush')
+def bump_change_stamps(session, flush_context):
+    """Bump the stamp of each scope written by this flush"""
+    scopes = set()
+    for obj in list(session.new) + list(session.deleted):
+        if type(obj) in SCOPES:
+            scopes.add(SCOPES[type(obj)])
+    for obj in session.dirty:
+        if type(obj) in SCOPES and session.is_modified(obj):
+            scopes.add(SCOPES[type(obj)])
+    if scopes:
+        versions = ChangeStamp.bump(session.connection(), sorted(scopes))
+        if 'tasks' in versions:
+            _stamp_task_changes(session, versions['tasks'])
@@ -0,0 +1,60 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from datetime import datetime
+from src.models.user import db
+from src.models.task import Task, TaskUpdate, previous_value
+
+class TaskEvent(db.Model):
+    """Append-only log of task changes, read by every worker's event hub"""
+    __tablename__ = 'task_events'
+    # AUTOINCREMENT keeps ids increasing even after the log is pruned empty,
+    # so a client's Last-Event-ID never collides with a newer event
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(30), nullable=False)  # task_created, task_updated, task_deleted, task_update_added
+    task_id = db.Column(db.Integer, nullable=False)
+    update_id = db.Column(db.Integer, nullable=True)
+    assignee_uid = db.Column(db.Integer, nullable=True)  # assignee when the event was written
+    previous_assignee_uid = db.Column(db.Integer, nullable=True)  # set when an update reassigned the task
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<TaskEvent {self.id} {self.kind} {self.task_id}>'
+
+    @staticmethod
+    def record(connection, rows):
+        """Append event rows written outside the ORM flush"""
+        if rows:
+            blank = {'update_id': None, 'assignee_uid': None, 'previous_assignee_uid': None,
+                     'created_at': datetime.utcnow()}
+            connection.execute(TaskEvent.__table__.insert(), [dict(blank, **row) for row in rows])
+
+    @staticmethod
+    def prune(before):
+        """Delete events older than the given time"""
+        TaskEvent.query.filter(TaskEvent.created_at < before).delete(synchronize_session=False)
+        db.session.commit()
+
+
+@event.listens_for(Session, 'after_flush')
+def record_task_events(session, flush_context):
+    """Log the task changes written by this flush"""
+    rows = []
+    for obj in session.new:
+        if isinstance(obj, Task):
+            rows.append({'kind': 'task_created', 'task_id': obj.id, 'assignee_uid': obj.assignee_uid})
+        elif isinstance(obj, TaskUpdate):
+            rows.append({'kind': 'task_update_added', 'task_id': obj.task_id, 'update_id': obj.id})
+    for obj in session.dirty:
+        if isinstance(obj, Task) and session.is_modified(obj):
+            previous = previous_value(obj, 'assignee_uid')
+            rows.append({
+                'kind': 'task_updated', 'task_id': obj.id, 'assignee_uid': obj.assignee_uid,
+                'previous_assignee_uid': previous if previous != obj.assignee_uid else None
+            })
+    for obj in session.deleted:
+        if isinstance(obj, Task):
+            rows.append({'kind': 'task_deleted', 'task_id': obj.id, 'assignee_uid': previous_value(obj, 'assignee_uid')})
+
+    TaskEvent.record(session.connection(), rows)
@@ -0,0 +1,91 @@
+import re
+from sqlalchemy import event
+from src.models.user import db
+from src.models.task import Task, TaskUpdate
+
+# Full-text index over task titles, descriptions and update comments, one row per task
+SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS task_search USING fts5(
+        title, description, comments, tokenize = 'unicode61 remove_diacritics 2', prefix = '3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS task_search_ai AFTER INSERT ON task BEGIN
+        INSERT INTO task_search (rowid, title, description, comments)
+        VALUES (new.id, new.title, coalesce(new.description, ''), '');
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_search_au AFTER UPDATE OF title, description ON task BEGIN
+        UPDATE task_search SET title = new.title, description = coalesce(new.description, '')
+        WHERE rowid = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_search_ad AFTER DELETE ON task BEGIN
+        DELETE FROM task_search WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_update_search_ai AFTER INSERT ON task_update
+    WHEN new.comment IS NOT NULL BEGIN
+        UPDATE task_search SET comments = comments || ' ' || new.comment WHERE rowid = new.task_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_update_search_au AFTER UPDATE OF comment ON task_update BEGIN
+        UPDATE task_search SET comments = coalesce(
+            (SELECT group_concat(comment, ' ') FROM task_update WHERE task_id = new.task_id), ''
+        ) WHERE rowid = new.task_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_update_search_ad AFTER DELETE ON task_update BEGIN
+        UPDATE task_search SET comments = coalesce(
+            (SELECT group_concat(comment, ' ') FROM task_update WHERE task_id = old.task_id), ''
+        ) WHERE rowid = old.task_id;
+    END""",
+]
+
+# Fills the index from existing rows
+SEARCH_BACKFILL = """
+    INSERT INTO task_search (rowid, title, description, comments)
+    SELECT task.id, task.title, coalesce(task.description, ''), coalesce(
+        (SELECT group_concat(comment, ' ') FROM task_update WHERE task_update.task_id = task.id), ''
+    )
+    FROM task
+    WHERE task.id NOT IN (SELECT rowid FROM task_search)
+"""
+
+# Shortest trailing word that is matched as a prefix
+MIN_PREFIX_LENGTH = 3
+
+# bm25 column weights for title, description and comments
+RANK = 'bm25(task_search, 10.0, 4.0, 1.0)'
+
+task_search = db.table('task_search', db.column('rowid'))
+
+def create_search_index(connection):
+    """Create the FTS5 table and its sync triggers, then index existing tasks"""
+    for statement in SEARCH_DDL:
+        connection.exec_driver_sql(statement)
+    connection.exec_driver_sql(SEARCH_BACKFILL)
+
+@event.listens_for(TaskUpdate.__table__, 'after_create')
+def _create_search_index(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        create_search_index(connection)
+
+def match_expression(text):
+    """Turn free text into an FTS5 query that ANDs each word, treating the last one as a prefix"""
+    words = re.findall(r'\w+', text)
+    terms = [f'"{word}"' for word in words]
+    # Very short prefixes match most of the index and make ranking expensive
+    if words and len(words[-1]) >= MIN_PREFIX_LENGTH:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+def search_tasks(query, text):
+    """Restrict a Task query to full-text matches for text, best matches first"""
+    if db.engine.dialect.name != 'sqlite':
+        # Without FTS5, fall back to a substring match on the task itself
+        pattern = f'%{text}%'
+        return query.filter(Task.title.ilike(pattern) | Task.description.ilike(pattern)) \
+            .order_by(Task.updated_at.desc())
+
+    match = match_expression(text)
+    if not match:
+        return query.filter(db.false())
+
+    return query.join(task_search, task_search.c.rowid == Task.id) \
+        .filter(db.text('task_search MATCH :match')) \
+        .params(match=match) \
+        .order_by(db.text(RANK))
@@ -1,6 +1,20 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 from datetime import datetime
-from src.models.user import db
+from src.models.user import User, db
+
+# Statuses that never count towards overdue tasks
+CLOSED_STATUSES = ['completed', 'cancelled']
+
+# Fields of to_dict that a task listing can be narrowed to with ?fields=
+TASK_FIELDS = ('id', 'title', 'description', 'status', 'priority', 'due_date',
+               'created_at', 'updated_at', 'assignee_uid', 'created_by_uid')
+
+# Predicate of the partial index over open tasks with a due date
+OPEN_TASK_WITH_DUE_DATE = db.text(
+    "status NOT IN ('completed', 'cancelled') AND due_date IS NOT NULL"
+)
 
 class Task(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -11,6 +25,7 @@ class Task(db.Model):
     due_date = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    change_seq = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # tasks change stamp of the last write
     
     # Foreign keys
     assignee_uid = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
@@ -19,6 +34,18 @@ class Task(db.Model):
     # Relationships
     updates = db.relationship('TaskUpdate', backref='task', lazy='dynamic', cascade='all, delete-orphan')
 
+    __table_args__ = (
+        db.Index('ix_task_due_date_id', 'due_date', 'id'),
+        db.Index('ix_task_assignee_due_date_id', 'assignee_uid', 'due_date', 'id'),
+        db.Index('ix_task_assignee_status_due_date', 'assignee_uid', 'status', 'due_date'),
+        db.Index('ix_task_created_by_created_at', 'created_by_uid', 'created_at'),
+        db.Index('ix_task_status_due_date', 'status', 'due_date'),
+        db.Index('ix_task_change_seq', 'change_seq'),
+        db.Index('ix_task_assignee_change_seq', 'assignee_uid', 'change_seq'),
+        db.Index('ix_task_open_due_date', 'due_date',
+                 sqlite_where=OPEN_TASK_WITH_DUE_DATE, postgresql_where=OPEN_TASK_WITH_DUE_DATE),
+    )
+
     def __repr__(self):
         return f'<Task {self.title}>'
 
@@ -40,13 +67,37 @@ class Task(db.Model):
         }
         
         if include_updates:
-            data['updates'] = [update.to_dict() for update in self.updates.order_by(TaskUpdate.created_at.desc())]
+            updates = self.updates.options(*TaskUpdate.eager_users()).order_by(TaskUpdate.created_at.desc())
+            data['updates'] = [update.to_dict() for update in updates]
             
         return data
 
+    @staticmethod
+    def parse_fields(value):
+        """Validate a comma-separated ?fields= list, keeping its order"""
+        fields = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+        if not fields:
+            raise ValueError('No fields requested')
+        for name in fields:
+            if name not in TASK_FIELDS:
+                raise ValueError(f'Unknown field: {name}')
+        return fields
+
+    @staticmethod
+    def is_open():
+        """Filter for tasks that are not closed, rendered inline so the open-task partial index applies"""
+        return Task.status.not_in(
+            db.bindparam('closed_statuses', CLOSED_STATUSES, expanding=True, literal_execute=True, unique=True)
+        )
+
+    @staticmethod
+    def eager_users():
+        """Loader options that fetch the assignee and creator with the task rows"""
+        return (db.joinedload(Task.assignee), db.joinedload(Task.creator))
+
     def is_overdue(self):
         """Check if task is overdue"""
-        if self.due_date and self.status not in ['completed', 'cancelled']:
+        if self.due_date and self.status not in CLOSED_STATUSES:
             return datetime.utcnow() > self.due_date
         return False
 
@@ -62,7 +113,7 @@ class Task(db.Model):
     @staticmethod
     def get_tasks_by_user(user_id, status=None):
         """Get tasks assigned to a specific user"""
-        query = Task.query.filter_by(assignee_uid=user_id)
+        query = Task.query.options(*Task.eager_users()).filter_by(assignee_uid=user_id)
         if status:
             query = query.filter_by(status=status)
         return query.order_by(Task.due_date.asc()).all()
@@ -70,7 +121,7 @@ class Task(db.Model):
     @staticmethod
     def get_tasks_by_creator(creator_id, status=None):
         """Get tasks created by a specific user"""
-        query = Task.query.filter_by(created_by_uid=creator_id)
+        query = Task.query.options(*Task.eager_users()).filter_by(created_by_uid=creator_id)
         if status:
             query = query.filter_by(status=status)
         return query.order_by(Task.created_at.desc()).all()
@@ -80,7 +131,7 @@ class Task(db.Model):
         """Get all overdue tasks"""
         return Task.query.filter(
             Task.due_date < datetime.utcnow(),
-            Task.status.notin_(['completed', 'cancelled'])
+            Task.is_open()
         ).all()
 
 
@@ -95,9 +146,28 @@ class TaskUpdate(db.Model):
     task_id = db.Column(db.Integer, db.ForeignKey('task.id'), nullable=False)
     updated_by_uid = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
+    # Stored screenshot and its derivatives, joined in with the update row
+    screenshot_blob = db.relationship(
+        'UploadBlob', primaryjoin='foreign(TaskUpdate.screenshot_path) == UploadBlob.path',
+        viewonly=True, lazy='joined'
+    )
+
+    __table_args__ = (
+        db.Index('ix_task_update_task_created_at', 'task_id', 'created_at'),
+    )
+
     def __repr__(self):
         return f'<TaskUpdate {self.id} for Task {self.task_id}>'
 
+    @staticmethod
+    def eager_users():
+        """Loader options that fetch the author with the update rows"""
+        return (db.joinedload(TaskUpdate.author),)
+
+    def _derivative_path(self, attr):
+        blob = self.screenshot_blob if self.screenshot_path else None
+        return getattr(blob, attr, None) or self.screenshot_path
+
     def to_dict(self):
         """Convert task update to dictionary"""
         return {
@@ -105,9 +175,124 @@ class TaskUpdate(db.Model):
             'comment': self.comment,
             'url': self.url,
             'screenshot_path': self.screenshot_path,
+            # Derivatives fall back to the original until the thumbnail worker has made them
+            'screenshot_thumbnail_path': self._derivative_path('thumbnail_path'),
+            'screenshot_preview_path': self._derivative_path('preview_path'),
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'task_id': self.task_id,
             'updated_by_uid': self.updated_by_uid,
             'author': self.author.to_dict() if self.author else None
         }
 
+
+
+class TaskStats(db.Model):
+    """Task counts per (assignee, status), kept current on every task write"""
+    __tablename__ = 'task_stats'
+
+    assignee_uid = db.Column(db.Integer, primary_key=True, autoincrement=False)  # 0 for unassigned tasks
+    status = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<TaskStats {self.assignee_uid}/{self.status}: {self.count}>'
+
+    @staticmethod
+    def summary(assignee_uid=None, include_users=False):
+        """Aggregate dashboard statistics for a scope in a single query"""
+        def status_count(status):
+            return db.func.coalesce(db.func.sum(
+                db.case((TaskStats.status == status, TaskStats.count), else_=0)
+            ), 0)
+
+        # Overdue depends on the clock, so it is counted from the task table
+        overdue = db.select(db.func.count(Task.id)).where(
+            Task.due_date < datetime.utcnow(),
+            Task.is_open()
+        )
+        if assignee_uid is not None:
+            overdue = overdue.where(Task.assignee_uid == assignee_uid)
+
+        columns = [
+            db.func.coalesce(db.func.sum(TaskStats.count), 0).label('total_tasks'),
+            status_count('pending').label('pending_tasks'),
+            status_count('in_progress').label('in_progress_tasks'),
+            status_count('completed').label('completed_tasks'),
+            overdue.scalar_subquery().label('overdue_tasks')
+        ]
+        if include_users:
+            columns += [
+                db.select(db.func.count(User.id)).scalar_subquery().label('total_users'),
+                db.select(db.func.count(User.id)).where(User.is_active.is_(True)).scalar_subquery().label('active_users')
+            ]
+
+        stmt = db.select(*columns)
+        if assignee_uid is not None:
+            stmt = stmt.where(TaskStats.assignee_uid == assignee_uid)
+        return dict(db.session.execute(stmt).one()._mapping)
+
+    @staticmethod
+    def rebuild():
+        """Recompute all counters from the task table"""
+        rows = db.session.query(
+            db.func.coalesce(Task.assignee_uid, 0), Task.status, db.func.count(Task.id)
+        ).group_by(Task.assignee_uid, Task.status).all()
+        TaskStats.query.delete()
+        db.session.add_all([
+            TaskStats(assignee_uid=assignee_uid, status=status, count=count)
+            for assignee_uid, status, count in rows
+        ])
+        db.session.commit()
+
+    @staticmethod
+    def key(assignee_uid, status):
+        """Counter key for a task's assignee and status"""
+        return (assignee_uid or 0, status or 'pending')
+
+    @staticmethod
+    def apply_deltas(connection, deltas):
+        """Add count deltas keyed by (assignee_uid, status) to the counters"""
+        table = TaskStats.__table__
+        for (assignee_uid, status), delta in deltas.items():
+            if not delta:
+                continue
+            key = (table.c.assignee_uid == assignee_uid) & (table.c.status == status)
+            result = connection.execute(
+                table.update().where(key).values(count=table.c.count + delta)
+            )
+            if result.rowcount == 0:
+                connection.execute(
+                    table.insert().values(assignee_uid=assignee_uid, status=status, count=delta)
+                )
+
+
+def previous_value(task, attr):
+    """Value of a task attribute before the changes being flushed"""
+    history = db.inspect(task).attrs[attr].history
+    return history.deleted[0] if history.deleted else getattr(task, attr)
+
+
+@event.listens_for(Session, 'after_flush')
+def update_task_stats(session, flush_context):
+    """Keep TaskStats in step with the tasks written by this flush"""
+    deltas = {}
+
+    def bump(key, amount):
+        deltas[key] = deltas.get(key, 0) + amount
+
+    for obj in session.new:
+        if isinstance(obj, Task):
+            bump(TaskStats.key(obj.assignee_uid, obj.status), 1)
+    for obj in session.dirty:
+        if isinstance(obj, Task):
+            old_key = TaskStats.key(previous_value(obj, 'assignee_uid'), previous_value(obj, 'status'))
+            new_key = TaskStats.key(obj.assignee_uid, obj.status)
+            if old_key != new_key:
+                bump(old_key, -1)
+                bump(new_key, 1)
+    for obj in session.deleted:
+        if isinstance(obj, Task):
+            bump(TaskStats.key(previous_value(obj, 'assignee_uid'), previous_value(obj, 'status')), -1)
+
+    if any(deltas.values()):
+        TaskStats.apply_deltas(session.connection(), deltas)
@@ -0,0 +1,115 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from datetime import datetime
+from src.models.user import db
+from src.models.task import TaskUpdate
+
+class UploadBlob(db.Model):
+    """A stored upload, keyed by content hash and shared by every update that attaches it"""
+    __tablename__ = 'upload_blobs'
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    path = db.Column(db.String(500), nullable=False, unique=True)  # relative to the static folder
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    last_used_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # reaper grace period starts here
+    thumbnail_path = db.Column(db.String(500), nullable=True)  # set once the derivatives are generated
+    preview_path = db.Column(db.String(500), nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_upload_blobs_ref_count_last_used_at', 'ref_count', 'last_used_at'),
+    )
+
+    def __repr__(self):
+        return f'<UploadBlob {self.sha256[:12]} refs={self.ref_count}>'
+
+    @staticmethod
+    def ensure(connection, sha256, path, size):
+        """Register a blob if it is new; returns (path, created), an existing blob keeps its own path"""
+        table = UploadBlob.__table__
+        now = datetime.utcnow()
+        # Touching the row first takes the write lock, so concurrent uploads of the same content serialize
+        existing = connection.execute(
+            table.update().where(table.c.sha256 == sha256).values(last_used_at=now).returning(table.c.path)
+        ).scalar()
+        if existing is not None:
+            return existing, False
+        connection.execute(table.insert().values(sha256=sha256, path=path, size=size, ref_count=0, last_used_at=now))
+        return path, True
+
+    @staticmethod
+    def apply_deltas(connection, deltas):
+        """Add reference count deltas keyed by path; paths outside the store are ignored"""
+        table = UploadBlob.__table__
+        now = datetime.utcnow()
+        for path, delta in deltas.items():
+            if delta:
+                connection.execute(
+                    table.update().where(table.c.path == path)
+                    .values(ref_count=table.c.ref_count + delta, last_used_at=now)
+                )
+
+class ThumbnailJob(db.Model):
+    """Persistent queue of blobs waiting for thumbnail and preview generation"""
+    __tablename__ = 'thumbnail_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), nullable=False, unique=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # A running job whose lease expired is claimed again; a pending one waits until then to be retried
+    locked_until = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_thumbnail_jobs_status_id', 'status', 'id'),
+    )
+
+    def __repr__(self):
+        return f'<ThumbnailJob {self.id} {self.status}>'
+
+    @staticmethod
+    def enqueue(connection, sha256, retry=False):
+        """Queue a blob unless it already has a job; retry requeues a finished or failed one"""
+        table = ThumbnailJob.__table__
+        exists = connection.execute(db.select(table.c.id).where(table.c.sha256 == sha256)).first()
+        if exists and retry:
+            connection.execute(table.update().where(table.c.id == exists.id, table.c.status != 'running')
+                               .values(status='pending', attempts=0, last_error=None, locked_until=None))
+        elif not exists:
+            connection.execute(table.insert().values(
+                sha256=sha256, status='pending', attempts=0, created_at=datetime.utcnow()
+            ))
+
+    @staticmethod
+    def claim(connection, lease):
+        """Atomically take the oldest runnable job; returns (id, sha256, attempts) or None"""
+        table = ThumbnailJob.__table__
+        now = datetime.utcnow()
+        runnable = db.or_(
+            db.and_(table.c.status == 'pending', db.or_(table.c.locked_until.is_(None), table.c.locked_until <= now)),
+            db.and_(table.c.status == 'running', table.c.locked_until < now)
+        )
+        next_id = db.select(table.c.id).where(runnable).order_by(table.c.id).limit(1) \
+            .with_for_update(skip_locked=True).scalar_subquery()
+        return connection.execute(
+            table.update().where(table.c.id == next_id, runnable)
+            .values(status='running', attempts=table.c.attempts + 1, locked_until=now + lease)
+            .returning(table.c.id, table.c.sha256, table.c.attempts)
+        ).first()
+
+
+@event.listens_for(Session, 'after_flush')
+def update_upload_refs(session, flush_context):
+    """Count the updates that attach each stored screenshot"""
+    deltas = {}
+    for obj in session.new:
+        if isinstance(obj, TaskUpdate) and obj.screenshot_path:
+            deltas[obj.screenshot_path] = deltas.get(obj.screenshot_path, 0) + 1
+    for obj in session.deleted:
+        if isinstance(obj, TaskUpdate) and obj.screenshot_path:
+            deltas[obj.screenshot_path] = deltas.get(obj.screenshot_path, 0) - 1
+
+    if any(deltas.values()):
+        UploadBlob.apply_deltas(session.connection(), deltas)
@@ -1,9 +1,12 @@
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from src.hashing import password_hasher
 from datetime import datetime
 
 db = SQLAlchemy()
 
+# Role levels, higher levels include the permissions of lower ones
+ROLE_HIERARCHY = {'user': 1, 'admin': 2, 'superadmin': 3}
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -13,6 +16,7 @@ class User(db.Model):
     role = db.Column(db.String(20), nullable=False, default='user')  # user, admin, superadmin
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
+    token_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # bumped to revoke issued tokens
     
     # Relationships
     assigned_tasks = db.relationship('Task', foreign_keys='Task.assignee_uid', backref='assignee', lazy='dynamic')
@@ -24,11 +28,15 @@ class User(db.Model):
 
     def set_password(self, password):
         """Hash and set the user's password"""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
         """Check if the provided password matches the hash"""
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """Check if the stored hash predates the configured work factor"""
+        return password_hasher.needs_rehash(self.password_hash)
 
     def to_dict(self, include_sensitive=False):
         """Convert user to dictionary, optionally including sensitive data"""
@@ -47,11 +55,18 @@ class User(db.Model):
 
     def has_role(self, role):
         """Check if user has a specific role or higher"""
-        role_hierarchy = {'user': 1, 'admin': 2, 'superadmin': 3}
-        user_level = role_hierarchy.get(self.role, 0)
-        required_level = role_hierarchy.get(role, 0)
+        user_level = ROLE_HIERARCHY.get(self.role, 0)
+        required_level = ROLE_HIERARCHY.get(role, 0)
         return user_level >= required_level
 
+    def token_claims(self):
+        """Additional JWT claims that let requests be authorized without a user lookup"""
+        return {'role': self.role, 'ver': self.token_version}
+
+    def revoke_tokens(self):
+        """Invalidate every token issued with the current role and status"""
+        self.token_version = (self.token_version or 1) + 1
+
     @staticmethod
     def create_user(username, email, password, display_name, role='user'):
         """Create a new user with hashed password"""
@@ -4,6 +4,10 @@ from flask_jwt_extended import (
     jwt_required, get_jwt_identity, get_jwt
 )
 from src.models.user import User, db
+from src.hashing import HashingBusy
+from src.authorization import authorize, current_principal
+from src.database import retry_on_lock
+from src.user_lookup import user_index
 from datetime import datetime
 
 auth_bp = Blueprint('auth', __name__)
@@ -31,8 +35,13 @@ def login():
         if not user.is_active:
             return jsonify({'error': 'Account is deactivated'}), 401
         
+        # Upgrade hashes made with an older work factor while the password is at hand
+        if user.password_needs_rehash():
+            user.set_password(data['password'])
+            db.session.commit()
+        
         # Create tokens (identity must be a string for JWT)
-        access_token = create_access_token(identity=str(user.id))
+        access_token = create_access_token(identity=str(user.id), additional_claims=user.token_claims())
         refresh_token = create_refresh_token(identity=str(user.id))
         
         return jsonify({
@@ -42,6 +51,8 @@ def login():
             'refresh_token': refresh_token
         }), 200
         
+    except HashingBusy:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -56,7 +67,7 @@ def refresh():
         if not user or not user.is_active:
             return jsonify({'error': 'User not found or inactive'}), 404
         
-        new_access_token = create_access_token(identity=str(current_user_id))
+        new_access_token = create_access_token(identity=str(user.id), additional_claims=user.token_claims())
         
         return jsonify({
             'access_token': new_access_token
@@ -66,12 +77,11 @@ def refresh():
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/me', methods=['GET'])
-@jwt_required()
+@authorize()
 def get_current_user():
     """Get current user information"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(int(current_user_id))
+        user = User.query.get(current_principal().id)
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -84,12 +94,11 @@ def get_current_user():
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/change-password', methods=['POST'])
-@jwt_required()
+@authorize()
 def change_password():
     """Change user password"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(int(current_user_id))
+        user = User.query.get(current_principal().id)
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -107,16 +116,18 @@ def change_password():
         
         return jsonify({'message': 'Password changed successfully'}), 200
         
+    except HashingBusy:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/update-profile', methods=['PUT'])
-@jwt_required()
+@authorize()
+@retry_on_lock
 def update_profile():
     """Update user profile"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = User.query.get(current_principal().id)
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -138,6 +149,7 @@ def update_profile():
             user.email = data['email']
         
         db.session.commit()
+        user_index.invalidate()
         
         return jsonify({
             'message': 'Profile updated successfully',
@@ -0,0 +1,13 @@
+from flask import Blueprint, current_app, jsonify, request
+import hmac
+from src.metrics import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint; with METRICS_TOKEN set it requires that bearer token"""
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return jsonify({'error': 'Authorization token is required'}), 401
+    return current_app.response_class(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,74 +1,231 @@
-from flask import Blueprint, jsonify, request, current_app
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from werkzeug.utils import secure_filename
+from flask import Blueprint, jsonify, request, Response, stream_with_context
+from werkzeug.exceptions import RequestEntityTooLarge
 from src.models.user import User, db
-from src.models.task import Task, TaskUpdate
+from src.models.task import Task, TaskUpdate, TaskStats
+from src.models.search import search_tasks
+from src.models.change import ChangeStamp, TaskTombstone
+from src.authorization import authorize, current_principal
+from src.compression import compress
+from src.conditional import conditional
+from src.database import retry_on_lock
+from src.events import event_hub
+from src.exports import EXPORT_FORMATS, stream_tasks
+from src.task_batch import MAX_BATCH_SIZE, apply_task_batch
+from src.uploads import store_upload
+from src.serializers import TASK_ROW, TASK_UPDATE_ROW, USER_ROW
 from datetime import datetime
-import os
-import uuid
+import base64
+import json
 
 task_bp = Blueprint('task', __name__)
 
-def allowed_file(filename):
-    """Check if file extension is allowed"""
-    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'}
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+# Page size limits for task listings
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
 
-def save_uploaded_file(file):
-    """Save uploaded file and return the path"""
-    if file and allowed_file(file.filename):
-        # Generate unique filename
-        filename = secure_filename(file.filename)
-        unique_filename = f"{uuid.uuid4()}_{filename}"
-        
-        # Create upload directory if it doesn't exist
-        upload_dir = os.path.join(current_app.static_folder, 'uploads')
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        # Save file
-        file_path = os.path.join(upload_dir, unique_filename)
-        file.save(file_path)
-        
-        # Return relative path for database storage
-        return f"uploads/{unique_filename}"
-    return None
+# Largest delta returned by /tasks/changes before the client is told to reload
+MAX_CHANGES = 1000
+
+def encode_cursor(task):
+    """Encode the (due_date, id) sort key of a task as an opaque cursor"""
+    key = [task.due_date.isoformat() if task.due_date else None, task.id]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode an opaque cursor back into a (due_date, id) sort key"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        due_date, task_id = json.loads(base64.urlsafe_b64decode(padded))
+        return (datetime.fromisoformat(due_date) if due_date else None), int(task_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+def paginate_tasks(query, limit, cursor=None):
+    """Return one page of tasks ordered by (due_date, id) plus the next cursor"""
+    if cursor:
+        due_date, task_id = decode_cursor(cursor)
+        if due_date is None:
+            # Tasks without a due date sort first
+            query = query.filter(db.or_(
+                Task.due_date.isnot(None),
+                db.and_(Task.due_date.is_(None), Task.id > task_id)
+            ))
+        else:
+            query = query.filter(db.or_(
+                Task.due_date > due_date,
+                db.and_(Task.due_date == due_date, Task.id > task_id)
+            ))
+
+    # Fetch one extra row to know whether another page exists
+    tasks = query.order_by(
+        Task.due_date.asc().nulls_first(), Task.id.asc()
+    ).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(tasks) > limit:
+        tasks = tasks[:limit]
+        next_cursor = encode_cursor(tasks[-1])
+    return tasks, next_cursor
+
+def task_filters(user, args):
+    """Build task criteria from the caller's role and the status/assigned_to/created_by filters"""
+    criteria = []
+    
+    # Admins and superadmins see all tasks (in a real app, this might be team-specific),
+    # regular users only see their assigned tasks
+    if not user.has_role('admin'):
+        criteria.append(Task.assignee_uid == user.id)
+    
+    if args.get('status'):
+        criteria.append(Task.status == args['status'])
+    if args.get('assigned_to') and user.has_role('admin'):
+        criteria.append(Task.assignee_uid == args['assigned_to'])
+    if args.get('created_by') and user.has_role('admin'):
+        criteria.append(Task.created_by_uid == args['created_by'])
+    return criteria
+
+def side_loaded_users(items):
+    """Users referenced by serialized tasks and updates, keyed by id, for normalized responses"""
+    ids = {item.get(key) for item in items for key in ('assignee_uid', 'created_by_uid', 'updated_by_uid')}
+    ids.discard(None)
+    if not ids:
+        return {}
+    return {str(user['id']): user for user in USER_ROW.all(User.query.filter(User.id.in_(ids)))}
+
+def wants_normalized(args):
+    """Whether users should be side-loaded once instead of embedded in every task"""
+    return args.get('shape') == 'normalized' or 'fields' in args
+
+def task_changes(user, since):
+    """Tasks visible to the caller changed after a sequence, plus the ids that left their view"""
+    # Read the sequence first: anything committed later is returned again next time
+    seq = ChangeStamp.current().get('tasks', 0)
+    # A first sync (since 0) has nothing to apply a delta to; tombstones are
+    # kept for good, so every other seq up to the current one is answerable
+    if since <= 0 or since > seq:
+        return {'reset': True, 'seq': seq}
+    
+    visible = [] if user.has_role('admin') else [Task.assignee_uid == user.id]
+    tasks = Task.query.options(*Task.eager_users()) \
+        .filter(Task.change_seq > since, *visible) \
+        .order_by(Task.change_seq, Task.id).limit(MAX_CHANGES + 1).all()
+    if len(tasks) > MAX_CHANGES:
+        return {'reset': True, 'seq': seq}
+    
+    # Admins only lose tasks to deletes; users also lose tasks reassigned away from them
+    tombstones = db.session.query(TaskTombstone.task_id).filter(TaskTombstone.change_seq > since)
+    if user.has_role('admin'):
+        tombstones = tombstones.filter(TaskTombstone.deleted.is_(True))
+    else:
+        tombstones = tombstones.filter(TaskTombstone.assignee_uid == user.id)
+    changed = {task.id for task in tasks}
+    deleted = sorted({row.task_id for row in tombstones} - changed)
+    
+    return {
+        'tasks': [task.to_dict() for task in tasks],
+        'deleted': deleted,
+        'seq': seq,
+        'reset': False
+    }
 
 @task_bp.route('/tasks', methods=['GET'])
-@jwt_required()
+@authorize()
+@conditional('tasks', 'users')
 def get_tasks():
     """Get tasks based on user role and filters"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        user = current_principal()
         
         # Get query parameters
-        status = request.args.get('status')
-        assigned_to = request.args.get('assigned_to')
-        created_by = request.args.get('created_by')
+        cursor = request.args.get('cursor')
         
-        # Build query based on user role
-        if user.role == 'superadmin':
-            # Superadmin can see all tasks
-            query = Task.query
-        elif user.role == 'admin':
-            # Admin can see all tasks (in a real app, this might be team-specific)
-            query = Task.query
+        try:
+            limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return jsonify({'error': 'Invalid limit'}), 400
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        
+        fields = None
+        if 'fields' in request.args:
+            try:
+                fields = Task.parse_fields(request.args['fields'])
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        normalized = wants_normalized(request.args)
+        
+        # Normalized lists are read as plain rows; only the requested columns when projected
+        serializer = None
+        if fields:
+            serializer = TASK_ROW.subset(fields, keep=('id', 'due_date'))
+        elif normalized:
+            serializer = TASK_ROW
+        
+        if serializer:
+            query = serializer.select(Task.query)
         else:
-            # Regular users can only see their assigned tasks
-            query = Task.query.filter_by(assignee_uid=current_user_id)
+            # Load assignees and creators in the same query as the tasks
+            query = Task.query.options(*Task.eager_users())
+        query = query.filter(*task_filters(user, request.args))
+        
+        try:
+            tasks, next_cursor = paginate_tasks(query, limit, cursor)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
         
-        # Apply filters
-        if status:
-            query = query.filter_by(status=status)
-        if assigned_to and user.has_role('admin'):
-            query = query.filter_by(assignee_uid=assigned_to)
-        if created_by and user.has_role('admin'):
-            query = query.filter_by(created_by_uid=created_by)
+        if serializer:
+            items = serializer.serialize(tasks)
+        else:
+            items = [task.to_dict() for task in tasks]
         
-        tasks = query.order_by(Task.due_date.asc()).all()
+        response = {'tasks': items, 'next_cursor': next_cursor}
+        if normalized:
+            response['users'] = side_loaded_users(items)
+        return jsonify(response), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@task_bp.route('/tasks/changes', methods=['GET'])
+@authorize()
+@conditional('tasks', 'users')
+def get_task_changes():
+    """Get tasks changed and removed since a change sequence"""
+    try:
+        user = current_principal()
+        
+        try:
+            since = int(request.args.get('since', 0))
+        except ValueError:
+            return jsonify({'error': 'Invalid since'}), 400
+        
+        return jsonify(task_changes(user, since)), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@task_bp.route('/tasks/search', methods=['GET'])
+@authorize()
+def search_tasks_route():
+    """Full-text search over task titles, descriptions and update comments"""
+    try:
+        user = current_principal()
+        
+        text = request.args.get('q', '').strip()
+        if not text:
+            return jsonify({'tasks': []}), 200
+        
+        try:
+            limit = int(request.args.get('limit', 20))
+        except ValueError:
+            return jsonify({'error': 'Invalid limit'}), 400
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        
+        # Same visibility rules as get_tasks
+        query = Task.query.options(*Task.eager_users())
+        if not user.has_role('admin'):
+            query = query.filter(Task.assignee_uid == user.id)
+        
+        tasks = search_tasks(query, text).limit(limit).all()
         
         return jsonify({
             'tasks': [task.to_dict() for task in tasks]
@@ -77,20 +234,59 @@ def get_tasks():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@task_bp.route('/tasks/export', methods=['GET'])
+@compress('fast')
+@authorize('admin')
+def export_tasks():
+    """Stream tasks, optionally with their updates, as NDJSON or CSV (admin only)"""
+    try:
+        fmt = request.args.get('format', 'ndjson')
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({'error': 'Format must be ndjson or csv'}), 400
+        
+        include_updates = request.args.get('include_updates', 'false').lower() == 'true'
+        criteria = task_filters(current_principal(), request.args)
+        filename = f"tasks-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{fmt}"
+        
+        return Response(
+            stream_with_context(stream_tasks(criteria, fmt, include_updates)),
+            mimetype=EXPORT_FORMATS[fmt],
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@task_bp.route('/events', methods=['GET'])
+@authorize()
+def task_events():
+    """Stream task changes visible to the caller as Server-Sent Events"""
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or 0)
+    except ValueError:
+        return jsonify({'error': 'Invalid Last-Event-ID'}), 400
+    
+    try:
+        subscriber = event_hub.subscribe(current_principal())
+        # Replay what a reconnecting client missed before handing over to the live queue
+        replay = event_hub.replay(subscriber, last_event_id) if last_event_id else []
+        
+        return Response(
+            event_hub.stream(subscriber, replay),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @task_bp.route('/tasks', methods=['POST'])
-@jwt_required()
+@authorize('admin')
+@retry_on_lock
 def create_task():
     """Create a new task"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
-        # Only admins and superadmins can create tasks
-        if not user.has_role('admin'):
-            return jsonify({'error': 'Insufficient permissions'}), 403
+        user = current_principal()
         
         data = request.get_json()
         
@@ -121,7 +317,7 @@ def create_task():
             priority=data.get('priority', 'medium'),
             due_date=due_date,
             assignee_uid=assignee_uid,
-            created_by_uid=current_user_id
+            created_by_uid=user.id
         )
         
         db.session.add(task)
@@ -135,21 +331,55 @@ def create_task():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@task_bp.route('/tasks/batch', methods=['POST'])
+@authorize('admin')
+@retry_on_lock
+def batch_tasks():
+    """Apply a list of create/update/delete operations in one transaction (admin only)"""
+    try:
+        data = request.get_json()
+        operations = data.get('operations') if isinstance(data, dict) else None
+        
+        if not isinstance(operations, list) or not operations:
+            return jsonify({'error': 'operations must be a non-empty list'}), 400
+        if len(operations) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'At most {MAX_BATCH_SIZE} operations per batch'}), 400
+        
+        results = apply_task_batch(operations, current_principal().id)
+        failed = sum(1 for result in results if result['status'] == 'error')
+        
+        return jsonify({
+            'message': f'{len(results) - failed} operations applied, {failed} failed',
+            'results': results
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @task_bp.route('/tasks/<int:task_id>', methods=['GET'])
-@jwt_required()
+@authorize()
+@conditional('tasks', 'users')
 def get_task(task_id):
     """Get a specific task with updates"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
-        task = Task.query.get_or_404(task_id)
+        user = current_principal()
+        
+        if request.args.get('shape') == 'normalized':
+            # Read as plain rows, with users side-loaded once
+            task = TASK_ROW.select(Task.query.filter(Task.id == task_id)).first_or_404()
+            if not user.has_role('admin') and task.assignee_uid != user.id:
+                return jsonify({'error': 'Access denied'}), 403
+            
+            data = TASK_ROW.serialize([task])[0]
+            data['updates'] = TASK_UPDATE_ROW.all(
+                TaskUpdate.query.filter(TaskUpdate.task_id == task_id).order_by(TaskUpdate.created_at.desc())
+            )
+            return jsonify({'task': data, 'users': side_loaded_users([data, *data['updates']])}), 200
+        
+        task = Task.query.options(*Task.eager_users()).get_or_404(task_id)
         
         # Check permissions
-        if not user.has_role('admin') and task.assignee_uid != current_user_id:
+        if not user.has_role('admin') and task.assignee_uid != user.id:
             return jsonify({'error': 'Access denied'}), 403
         
         return jsonify({
@@ -160,20 +390,17 @@ def get_task(task_id):
         return jsonify({'error': str(e)}), 500
 
 @task_bp.route('/tasks/<int:task_id>', methods=['PUT'])
-@jwt_required()
+@authorize()
+@retry_on_lock
 def update_task(task_id):
     """Update a task"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        user = current_principal()
         
         task = Task.query.get_or_404(task_id)
         
         # Check permissions - admins can edit any task, users can only update status of their tasks
-        if not user.has_role('admin') and task.assignee_uid != current_user_id:
+        if not user.has_role('admin') and task.assignee_uid != user.id:
             return jsonify({'error': 'Access denied'}), 403
         
         data = request.get_json()
@@ -217,20 +444,11 @@ def update_task(task_id):
         return jsonify({'error': str(e)}), 500
 
 @task_bp.route('/tasks/<int:task_id>', methods=['DELETE'])
-@jwt_required()
+@authorize('admin')
+@retry_on_lock
 def delete_task(task_id):
     """Delete a task"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
-        # Only admins can delete tasks
-        if not user.has_role('admin'):
-            return jsonify({'error': 'Insufficient permissions'}), 403
-        
         task = Task.query.get_or_404(task_id)
         
         db.session.delete(task)
@@ -242,28 +460,24 @@ def delete_task(task_id):
         return jsonify({'error': str(e)}), 500
 
 @task_bp.route('/tasks/<int:task_id>/updates', methods=['POST'])
-@jwt_required()
-def add_task_update():
+@authorize()
+@retry_on_lock
+def add_task_update(task_id):
     """Add an update to a task"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        user = current_principal()
         
-        task_id = request.view_args['task_id']
         task = Task.query.get_or_404(task_id)
         
         # Check permissions
-        if not user.has_role('admin') and task.assignee_uid != current_user_id:
+        if not user.has_role('admin') and task.assignee_uid != user.id:
             return jsonify({'error': 'Access denied'}), 403
         
         # Handle file upload
         screenshot_path = None
         if 'screenshot' in request.files:
             file = request.files['screenshot']
-            screenshot_path = save_uploaded_file(file)
+            screenshot_path = store_upload(file)
         
         # Get form data
         comment = request.form.get('comment')
@@ -278,7 +492,7 @@ def add_task_update():
             url=url,
             screenshot_path=screenshot_path,
             task_id=task_id,
-            updated_by_uid=current_user_id
+            updated_by_uid=user.id
         )
         
         db.session.add(update)
@@ -292,52 +506,30 @@ def add_task_update():
             'update': update.to_dict()
         }), 201
         
+    except RequestEntityTooLarge:
+        return jsonify({'error': 'Upload is too large'}), 413
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @task_bp.route('/dashboard/stats', methods=['GET'])
-@jwt_required()
+@authorize()
+# Overdue counts change with the clock, so the tag also expires every minute
+@conditional('tasks', 'users', max_age=60)
 def get_dashboard_stats():
     """Get dashboard statistics"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
-        stats = {}
+        user = current_principal()
         
         if user.role == 'superadmin':
             # Global statistics
-            stats = {
-                'total_tasks': Task.query.count(),
-                'pending_tasks': Task.query.filter_by(status='pending').count(),
-                'in_progress_tasks': Task.query.filter_by(status='in_progress').count(),
-                'completed_tasks': Task.query.filter_by(status='completed').count(),
-                'overdue_tasks': len(Task.get_overdue_tasks()),
-                'total_users': User.query.count(),
-                'active_users': User.query.filter_by(is_active=True).count()
-            }
+            stats = TaskStats.summary(include_users=True)
         elif user.role == 'admin':
             # Team statistics (simplified - in real app might be team-specific)
-            stats = {
-                'total_tasks': Task.query.count(),
-                'pending_tasks': Task.query.filter_by(status='pending').count(),
-                'in_progress_tasks': Task.query.filter_by(status='in_progress').count(),
-                'completed_tasks': Task.query.filter_by(status='completed').count(),
-                'overdue_tasks': len(Task.get_overdue_tasks())
-            }
+            stats = TaskStats.summary()
         else:
             # User-specific statistics
-            user_tasks = Task.query.filter_by(assignee_uid=current_user_id)
-            stats = {
-                'my_tasks': user_tasks.count(),
-                'pending_tasks': user_tasks.filter_by(status='pending').count(),
-                'in_progress_tasks': user_tasks.filter_by(status='in_progress').count(),
-                'completed_tasks': user_tasks.filter_by(status='completed').count(),
-                'overdue_tasks': len([t for t in user_tasks.all() if t.is_overdue()])
-            }
+            stats = TaskStats.summary(assignee_uid=user.id)
+            stats['my_tasks'] = stats.pop('total_tasks')
         
         return jsonify({'stats': stats}), 200
         
@@ -0,0 +1,35 @@
+from flask import Blueprint, current_app, send_from_directory, abort
+from werkzeug.security import safe_join
+import mimetypes
+import posixpath
+from src.compression import compress
+from src.uploads import upload_folder
+
+uploads_bp = Blueprint('uploads', __name__)
+
+# Stored names change whenever the content does, so responses never need revalidating
+UPLOAD_MAX_AGE = 365 * 24 * 3600
+
+@uploads_bp.route('/uploads/<path:filename>', methods=['GET'])
+@compress(False)
+def serve_upload(filename):
+    """Serve a stored upload with Range support and immutable caching"""
+    # Checked and served as normalized, so ./tmp/ or x/../tmp/ cannot reach partial uploads
+    filename = posixpath.normpath(filename)
+    if filename.split('/')[0] in ('tmp', '.', '..') or safe_join(upload_folder(), filename) is None:
+        abort(404)
+
+    accel_prefix = current_app.config.get('UPLOAD_ACCEL_REDIRECT')
+    if accel_prefix:
+        # The front proxy sends the file (and handles Range); the worker only names it
+        response = current_app.response_class()
+        response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{filename}"
+        response.headers['Content-Type'] = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    else:
+        # Handles Range and If-None-Match; with USE_X_SENDFILE the proxy sends the body,
+        # otherwise the server's file wrapper streams it with sendfile()
+        response = send_from_directory(upload_folder(), filename, max_age=UPLOAD_MAX_AGE, conditional=True)
+        response.headers['Accept-Ranges'] = 'bytes'
+
+    response.headers['Cache-Control'] = f'public, max-age={UPLOAD_MAX_AGE}, immutable'
+    return response
@@ -1,24 +1,19 @@
 from flask import Blueprint, jsonify, request
-from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.models.user import User, db
+from src.hashing import HashingBusy
+from src.authorization import authorize, current_principal, user_cache
+from src.conditional import conditional
+from src.database import retry_on_lock
+from src.user_lookup import user_index
 
 user_bp = Blueprint('user', __name__)
 
 @user_bp.route('/users', methods=['GET'])
-@jwt_required()
+@authorize('admin')
+@conditional('users')
 def get_users():
     """Get all users (admin/superadmin only)"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
-        # Only admins and superadmins can view all users
-        if not user.has_role('admin'):
-            return jsonify({'error': 'Insufficient permissions'}), 403
-        
         # Get query parameters
         role = request.args.get('role')
         is_active = request.args.get('is_active')
@@ -43,20 +38,12 @@ def get_users():
         return jsonify({'error': str(e)}), 500
 
 @user_bp.route('/users', methods=['POST'])
-@jwt_required()
+@authorize('admin')
+@retry_on_lock
 def create_user():
     """Create a new user (admin/superadmin only)"""
     try:
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        
-        if not current_user:
-            return jsonify({'error': 'User not found'}), 404
-        
-        # Only admins and superadmins can create users
-        if not current_user.has_role('admin'):
-            return jsonify({'error': 'Insufficient permissions'}), 403
-        
+        current_user = current_principal()
         data = request.get_json()
         
         # Validate required fields
@@ -88,28 +75,27 @@ def create_user():
         
         db.session.add(user)
         db.session.commit()
+        user_index.invalidate()
         
         return jsonify({
             'message': 'User created successfully',
             'user': user.to_dict()
         }), 201
         
+    except HashingBusy:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @user_bp.route('/users/<int:user_id>', methods=['GET'])
-@jwt_required()
+@authorize()
 def get_user(user_id):
     """Get a specific user"""
     try:
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        
-        if not current_user:
-            return jsonify({'error': 'User not found'}), 404
+        current_user = current_principal()
         
         # Users can view their own profile, admins can view any profile
-        if user_id != current_user_id and not current_user.has_role('admin'):
+        if user_id != current_user.id and not current_user.has_role('admin'):
             return jsonify({'error': 'Access denied'}), 403
         
         user = User.query.get_or_404(user_id)
@@ -122,20 +108,16 @@ def get_user(user_id):
         return jsonify({'error': str(e)}), 500
 
 @user_bp.route('/users/<int:user_id>', methods=['PUT'])
-@jwt_required()
+@authorize()
+@retry_on_lock
 def update_user(user_id):
     """Update a user"""
     try:
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        
-        if not current_user:
-            return jsonify({'error': 'User not found'}), 404
-        
+        current_user = current_principal()
         user = User.query.get_or_404(user_id)
         
         # Users can update their own profile, admins can update any profile
-        if user_id != current_user_id and not current_user.has_role('admin'):
+        if user_id != current_user.id and not current_user.has_role('admin'):
             return jsonify({'error': 'Access denied'}), 403
         
         data = request.get_json()
@@ -160,70 +142,86 @@ def update_user(user_id):
                 # Only superadmins can change roles to admin/superadmin
                 if data['role'] in ['admin', 'superadmin'] and current_user.role != 'superadmin':
                     return jsonify({'error': 'Only superadmins can assign admin roles'}), 403
-                user.role = data['role']
+                if data['role'] != user.role:
+                    user.role = data['role']
+                    user.revoke_tokens()
             
-            if 'is_active' in data:
+            if 'is_active' in data and data['is_active'] != user.is_active:
                 user.is_active = data['is_active']
+                user.revoke_tokens()
         
         # Password update (if provided)
         if 'password' in data:
             user.set_password(data['password'])
         
         db.session.commit()
+        user_cache.invalidate(user.id)
+        user_index.invalidate()
         
         return jsonify({
             'message': 'User updated successfully',
             'user': user.to_dict()
         }), 200
         
+    except HashingBusy:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @user_bp.route('/users/<int:user_id>', methods=['DELETE'])
-@jwt_required()
+@authorize()
+@retry_on_lock
 def delete_user(user_id):
     """Delete a user (superadmin only)"""
     try:
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        
-        if not current_user:
-            return jsonify({'error': 'User not found'}), 404
+        current_user = current_principal()
         
         # Only superadmins can delete users
         if current_user.role != 'superadmin':
             return jsonify({'error': 'Only superadmins can delete users'}), 403
         
         # Prevent self-deletion
-        if user_id == current_user_id:
+        if user_id == current_user.id:
             return jsonify({'error': 'Cannot delete your own account'}), 400
         
         user = User.query.get_or_404(user_id)
         
         # Instead of hard delete, deactivate the user to preserve data integrity
         user.is_active = False
+        user.revoke_tokens()
         db.session.commit()
+        user_cache.invalidate(user.id)
+        user_index.invalidate()
         
         return jsonify({'message': 'User deactivated successfully'}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@user_bp.route('/users/search', methods=['GET'])
-@jwt_required()
-def search_users():
-    """Search users by username or display name (admin only)"""
+@user_bp.route('/users/lookup', methods=['GET'])
+@authorize('admin')
+def lookup_users():
+    """Typeahead lookup of active users by username or display name prefix (admin only)"""
     try:
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
+        prefix = request.args.get('prefix', '')
         
-        if not current_user:
-            return jsonify({'error': 'User not found'}), 404
+        try:
+            limit = max(1, min(int(request.args.get('limit', 10)), 50))
+        except ValueError:
+            return jsonify({'error': 'Invalid limit'}), 400
         
-        # Only admins can search users
-        if not current_user.has_role('admin'):
-            return jsonify({'error': 'Insufficient permissions'}), 403
+        return jsonify({
+            'users': user_index.lookup(prefix, limit)
+        }), 200
         
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@user_bp.route('/users/search', methods=['GET'])
+@authorize('admin')
+def search_users():
+    """Search users by username or display name (admin only)"""
+    try:
         query = request.args.get('q', '').strip()
         
         if not query:
@@ -0,0 +1,185 @@
+import itertools
+import random
+import click
+from datetime import datetime, timedelta
+from flask.cli import with_appcontext
+from src.hashing import password_hasher
+from src.models.user import User, db
+from src.models.task import Task, TaskUpdate, TaskStats, CLOSED_STATUSES
+from src.models.change import ChangeStamp
+
+# Password of every generated user
+SEED_PASSWORD = 'seed-password'
+# Rows written per INSERT
+SEED_BATCH_SIZE = 5000
+
+STATUS_WEIGHTS = {'pending': 40, 'in_progress': 20, 'completed': 35, 'cancelled': 5}
+PRIORITY_WEIGHTS = {'low': 25, 'medium': 45, 'high': 22, 'urgent': 8}
+# Shares of generated users that are admins or deactivated, and of tasks without an assignee or due date
+ADMIN_SHARE = 0.1
+INACTIVE_SHARE = 0.05
+UNASSIGNED_SHARE = 0.05
+NO_DUE_DATE_SHARE = 0.1
+HISTORY_DAYS = 365
+
+VERBS = ['Review', 'Update', 'Fix', 'Migrate', 'Document', 'Audit', 'Deploy', 'Test', 'Design', 'Replace']
+SUBJECTS = ['invoice export', 'login page', 'backup job', 'VPN access', 'printer driver', 'price list',
+            'onboarding guide', 'firewall rules', 'customer portal', 'warehouse scanner', 'mail server',
+            'quarterly report', 'CRM import', 'laptop fleet', 'payroll sync', 'ticket queue']
+SITES = ['Berlin', 'Vienna', 'Zurich', 'Munich', 'Hamburg', 'Graz']
+WORDS = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore '
+         'et dolore magna aliqua customer server network license backup report deadline vendor').split()
+
+def _sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+def _between(rng, start, end):
+    return start + timedelta(seconds=rng.uniform(0, max((end - start).total_seconds(), 0)))
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def generate_dataset(users=50, tasks=10000, updates=2, overdue=0.15, skew=1.1, password=SEED_PASSWORD,
+                     seed=1, batch_size=SEED_BATCH_SIZE, progress=None):
+    """Insert generated users, tasks and task updates into the SQLite database; returns the counts.
+
+    Tasks are spread over assignees with a Zipf distribution (skew 0 is
+    even), so a few users hold most of them. Each task gets between 0 and
+    2 * updates updates. overdue is the share of open tasks whose due date
+    has passed. With users=0 the tasks go to the active users already in
+    the database. Dates are relative to now, everything else follows from
+    seed. Rows are written with bulk INSERTs, bypassing the ORM; the
+    derived tables are brought up to date afterwards.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        raise ValueError('The data generator writes ids directly and supports SQLite only')
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    connection = db.session.connection()
+
+    # Taking the write lock first keeps the ids read below ours until commit
+    versions = ChangeStamp.bump(connection, ['tasks', 'users'])
+    user_id = connection.execute(db.select(db.func.coalesce(db.func.max(User.id), 0))).scalar()
+    task_id = connection.execute(db.select(db.func.coalesce(db.func.max(Task.id), 0))).scalar()
+    update_id = connection.execute(db.select(db.func.coalesce(db.func.max(TaskUpdate.id), 0))).scalar()
+    # Numbered on from earlier runs, so usernames stay unique
+    start = connection.execute(db.select(db.func.count(User.id)).where(User.username.like('seed\\_%', escape='\\'))).scalar()
+
+    # One hash for everyone; hashing each user would dominate the run
+    password_hash = password_hasher.hash(password)
+    user_rows = []
+    for index in range(users):
+        number = start + index
+        role = 'admin' if index < max(1, round(users * ADMIN_SHARE)) else 'user'
+        user_rows.append({
+            'id': user_id + index + 1,
+            'username': f'seed_{role}_{number}',
+            'email': f'seed_{role}_{number}@example.com',
+            'password_hash': password_hash,
+            'display_name': f'{rng.choice(SITES)} {role.title()} {number}',
+            'role': role,
+            'created_at': now - timedelta(days=HISTORY_DAYS + rng.uniform(0, 30)),
+            'is_active': role == 'admin' or rng.random() >= INACTIVE_SHARE,
+            'token_version': 1,
+        })
+    for chunk in _chunks(user_rows, batch_size):
+        connection.execute(User.__table__.insert(), chunk)
+
+    creators = [row['id'] for row in user_rows if row['role'] == 'admin']
+    assignees = [row['id'] for row in user_rows if row['role'] == 'user' and row['is_active']]
+    if not user_rows:
+        # Adding tasks only: they go to the users already in the database
+        active = connection.execute(
+            db.select(User.id, User.role).where(User.is_active.is_(True)).order_by(User.id)
+        ).all()
+        creators = [row.id for row in active if row.role in ('admin', 'superadmin')]
+        assignees = [row.id for row in active if row.role == 'user']
+    if tasks and not creators:
+        db.session.rollback()
+        raise ValueError('Tasks need an active admin to create them; generate at least one user')
+    assignees = assignees or creators
+    weights = [1 / rank ** skew for rank in range(1, len(assignees) + 1)]
+    cumulative = list(itertools.accumulate(weights))
+    statuses, status_weights = list(STATUS_WEIGHTS), list(STATUS_WEIGHTS.values())
+    priorities, priority_weights = list(PRIORITY_WEIGHTS), list(PRIORITY_WEIGHTS.values())
+    counts = {'users': users, 'tasks': 0, 'updates': 0, 'overdue': 0}
+
+    def task_rows():
+        for index in range(tasks):
+            created_at = now - timedelta(days=rng.uniform(0, HISTORY_DAYS))
+            status = rng.choices(statuses, status_weights)[0]
+            if rng.random() < NO_DUE_DATE_SHARE:
+                due_date = None
+            elif status in CLOSED_STATUSES:
+                due_date = _between(rng, created_at, now)
+            elif rng.random() < overdue:
+                due_date = _between(rng, max(created_at, now - timedelta(days=60)), now)
+                counts['overdue'] += 1
+            else:
+                due_date = now + timedelta(days=rng.uniform(1, 90))
+            counts['tasks'] += 1
+            yield {
+                'id': task_id + index + 1,
+                'title': f'{rng.choice(VERBS)} {rng.choice(SUBJECTS)} for {rng.choice(SITES)}',
+                'description': _sentence(rng, rng.randint(8, 40)),
+                'status': status,
+                'priority': rng.choices(priorities, priority_weights)[0],
+                'due_date': due_date,
+                'created_at': created_at,
+                'updated_at': _between(rng, created_at, now),
+                'change_seq': versions['tasks'],
+                'assignee_uid': None if rng.random() < UNASSIGNED_SHARE else rng.choices(assignees, cum_weights=cumulative)[0],
+                'created_by_uid': rng.choice(creators),
+            }
+
+    def update_rows(chunk):
+        for task in chunk:
+            authors = [uid for uid in (task['assignee_uid'], task['created_by_uid']) if uid]
+            for _ in range(rng.randint(0, 2 * updates)):
+                counts['updates'] += 1
+                yield {
+                    'id': update_id + counts['updates'],
+                    'comment': _sentence(rng, rng.randint(4, 20)),
+                    'url': f'https://example.com/tickets/{rng.randint(1000, 99999)}' if rng.random() < 0.2 else None,
+                    'screenshot_path': None,
+                    'created_at': _between(rng, task['created_at'], now),
+                    'task_id': task['id'],
+                    'updated_by_uid': rng.choice(authors),
+                }
+
+    for chunk in _chunks(task_rows(), batch_size):
+        connection.execute(Task.__table__.insert(), chunk)
+        updates_chunk = list(update_rows(chunk))
+        if updates_chunk:
+            connection.execute(TaskUpdate.__table__.insert(), updates_chunk)
+        if progress:
+            progress(f"{counts['tasks']} tasks, {counts['updates']} updates")
+
+    # Commits the whole run
+    TaskStats.rebuild()
+    return counts
+
+@click.command('seed-data')
+@click.option('--users', default=50, show_default=True, help='Users to create, one in ten of them admins.')
+@click.option('--tasks', default=10000, show_default=True, help='Tasks to create.')
+@click.option('--updates', default=2, show_default=True, help='Average updates per task.')
+@click.option('--overdue', default=0.15, show_default=True, help='Share of open tasks that are past due.')
+@click.option('--skew', default=1.1, show_default=True, help='Zipf exponent of tasks per assignee (0 is even).')
+@click.option('--password', default=SEED_PASSWORD, show_default=True, help='Password of every generated user.')
+@click.option('--seed', default=1, show_default=True, help='Random seed; the same options give the same data.')
+@with_appcontext
+def seed_data_command(users, tasks, updates, overdue, skew, password, seed):
+    """Fill the database with generated users, tasks and task updates."""
+    try:
+        counts = generate_dataset(users, tasks, updates, overdue, skew, password, seed, progress=click.echo)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Created {counts['users']} users, {counts['tasks']} tasks ({counts['overdue']} overdue) "
+               f"and {counts['updates']} task updates")
@@ -0,0 +1,60 @@
+from src.models.user import User, db
+from src.models.task import Task, TaskUpdate, TASK_FIELDS
+from src.models.upload import UploadBlob
+
+class RowSerializer:
+    """Builds to_dict-shaped dictionaries from Query.with_entities rows, without ORM instances.
+
+    Users are referenced by id only, as in the normalized response shape.
+    Datetimes are left to the JSON provider, which writes them in ISO 8601.
+    """
+
+    def __init__(self, fields, outerjoins=(), extra=()):
+        self.fields = fields
+        self.names = tuple(fields)
+        self.outerjoins = outerjoins
+        # Extra columns are selected after the named ones, so zip() leaves them out of the output
+        self.columns = [column.label(name) for name, column in fields.items()] + list(extra)
+
+    def subset(self, names, keep=()):
+        """Serializer for some of the fields; keep names columns that are read but not returned"""
+        extra = [self.fields[name].label(name) for name in keep if name not in names]
+        return RowSerializer({name: self.fields[name] for name in names}, self.outerjoins, extra)
+
+    def select(self, query):
+        query = query.with_entities(*self.columns)
+        for target, onclause in self.outerjoins:
+            query = query.outerjoin(target, onclause)
+        return query
+
+    def serialize(self, rows):
+        names = self.names
+        return [dict(zip(names, row)) for row in rows]
+
+    def all(self, query):
+        return self.serialize(self.select(query))
+
+TASK_ROW = RowSerializer({name: getattr(Task, name) for name in TASK_FIELDS})
+
+TASK_UPDATE_ROW = RowSerializer({
+    'id': TaskUpdate.id,
+    'comment': TaskUpdate.comment,
+    'url': TaskUpdate.url,
+    'screenshot_path': TaskUpdate.screenshot_path,
+    # Derivatives fall back to the original until the thumbnail worker has made them
+    'screenshot_thumbnail_path': db.func.coalesce(UploadBlob.thumbnail_path, TaskUpdate.screenshot_path),
+    'screenshot_preview_path': db.func.coalesce(UploadBlob.preview_path, TaskUpdate.screenshot_path),
+    'created_at': TaskUpdate.created_at,
+    'task_id': TaskUpdate.task_id,
+    'updated_by_uid': TaskUpdate.updated_by_uid,
+}, outerjoins=[(UploadBlob, UploadBlob.path == TaskUpdate.screenshot_path)])
+
+USER_ROW = RowSerializer({
+    'id': User.id,
+    'username': User.username,
+    'email': User.email,
+    'display_name': User.display_name,
+    'role': User.role,
+    'created_at': User.created_at,
+    'is_active': User.is_active,
+})
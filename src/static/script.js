@@ -6,6 +6,31 @@ let currentView = 'dashboard';
 // API Base URL
 const API_BASE = '/api';
 
+// Last ETag and body per URL, revalidated with If-None-Match
+const responseCache = new Map();
+
+// GET a JSON endpoint, reusing the cached body when the server answers 304
+async function fetchConditional(url) {
+    const key = String(url);
+    const cached = responseCache.get(key);
+    const headers = { 'Authorization': `Bearer ${authToken}` };
+    if (cached) {
+        headers['If-None-Match'] = cached.etag;
+    }
+
+    const response = await fetch(url, { headers, cache: 'no-store' });
+    if (response.status === 304 && cached) {
+        return new Response(cached.body, { status: 200, headers: { 'Content-Type': 'application/json' } });
+    }
+
+    const etag = response.headers.get('ETag');
+    if (response.ok && etag) {
+        const body = await response.clone().text();
+        responseCache.set(key, { etag, body });
+    }
+    return response;
+}
+
 // DOM Elements
 const loadingScreen = document.getElementById('loading-screen');
 const loginScreen = document.getElementById('login-screen');
@@ -106,7 +131,21 @@ function setupEventListeners() {
     }
     
     // Filters
-    document.getElementById('status-filter').addEventListener('change', loadTasks);
+    document.getElementById('status-filter').addEventListener('change', () => loadTasks());
+    
+    // Search, debounced so typing does not fire a request per keystroke
+    let searchTimer = null;
+    document.getElementById('task-search').addEventListener('input', (e) => {
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(() => {
+            const query = e.target.value.trim();
+            if (query) {
+                searchTasks(query);
+            } else {
+                loadTasks();
+            }
+        }, 250);
+    });
 }
 
 // Authentication handlers
@@ -132,6 +171,8 @@ async function handleLogin(e) {
         
         if (response.ok) {
             authToken = data.access_token;
+            responseCache.clear();
+            lastEventId = null;
             currentUser = data.user;
             
             // Store in localStorage
@@ -156,8 +197,10 @@ async function handleRegister(e) {
 }
 
 function handleLogout() {
+    stopEventStream();
     authToken = null;
     currentUser = null;
+    responseCache.clear();
     localStorage.removeItem('authToken');
     localStorage.removeItem('currentUser');
     
@@ -176,6 +219,135 @@ function showApp() {
     updateUserInfo();
     updateUIForRole();
     switchView('dashboard');
+    startEventStream();
+}
+
+// Live task events
+let eventStream = null;
+let lastEventId = null;
+let dashboardRefreshTimer = null;
+
+// Read /api/events with fetch so the token travels in the Authorization header
+async function startEventStream() {
+    stopEventStream();
+    const controller = new AbortController();
+    eventStream = controller;
+    let retryDelay = 3000;
+
+    try {
+        const headers = { 'Authorization': `Bearer ${authToken}` };
+        if (lastEventId) {
+            headers['Last-Event-ID'] = lastEventId;
+        }
+        const response = await fetch(`${API_BASE}/events`, { headers, signal: controller.signal });
+        if (!response.ok) {
+            return;
+        }
+
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) {
+                break;
+            }
+            buffer += value;
+            let end;
+            while ((end = buffer.indexOf('\n\n')) !== -1) {
+                const message = parseEventMessage(buffer.slice(0, end));
+                buffer = buffer.slice(end + 2);
+                if (message.retry) {
+                    retryDelay = message.retry;
+                }
+                if (message.event) {
+                    handleTaskEvent(message);
+                }
+            }
+        }
+    } catch (error) {
+        if (controller.signal.aborted) {
+            return;
+        }
+        console.error('Event stream error:', error);
+    }
+
+    // The server closes streams periodically; reconnect and resume from the last id
+    if (eventStream === controller) {
+        setTimeout(() => {
+            if (eventStream === controller) {
+                startEventStream();
+            }
+        }, retryDelay);
+    }
+}
+
+function stopEventStream() {
+    if (eventStream) {
+        eventStream.abort();
+        eventStream = null;
+    }
+}
+
+function parseEventMessage(text) {
+    const message = { data: '' };
+    text.split('\n').forEach(line => {
+        if (!line || line.startsWith(':')) {
+            return;
+        }
+        const colon = line.indexOf(':');
+        const field = colon === -1 ? line : line.slice(0, colon);
+        const value = colon === -1 ? '' : line.slice(colon + 1).replace(/^ /, '');
+        if (field === 'data') {
+            message.data += value;
+        } else if (field === 'retry') {
+            message.retry = parseInt(value, 10);
+        } else {
+            message[field] = value;
+        }
+    });
+    return message;
+}
+
+function handleTaskEvent(message) {
+    if (message.id) {
+        lastEventId = message.id;
+    }
+    const data = JSON.parse(message.data || '{}');
+
+    switch (message.event) {
+        case 'task_created':
+        case 'task_updated':
+            upsertTaskCard(data, message.event === 'task_created');
+            break;
+        case 'task_deleted':
+            document.querySelectorAll(`.task-card[data-task-id="${data.id}"]`).forEach(card => card.remove());
+            break;
+        case 'resync':
+            // Too far behind to patch; reload the current view
+            lastEventId = null;
+            switchView(currentView);
+            return;
+    }
+
+    // Counters are cheap to revalidate; coalesce bursts of events into one reload
+    if (currentView === 'dashboard') {
+        clearTimeout(dashboardRefreshTimer);
+        dashboardRefreshTimer = setTimeout(loadDashboard, 500);
+    }
+}
+
+function upsertTaskCard(task, isNew) {
+    const cards = document.querySelectorAll(`.task-card[data-task-id="${task.id}"]`);
+    cards.forEach(card => card.replaceWith(createTaskCard(task)));
+
+    if (cards.length === 0 && isNew && currentView === 'tasks') {
+        const container = document.getElementById('tasks-list');
+        const placeholder = container.querySelector('.text-muted');
+        if (placeholder) {
+            placeholder.remove();
+        }
+        container.prepend(createTaskCard(task));
+    }
 }
 
 function updateUserInfo() {
@@ -246,15 +418,8 @@ async function loadDashboard() {
     try {
         console.log('Loading dashboard with token:', authToken ? 'Token present' : 'No token');
         const [statsResponse, tasksResponse] = await Promise.all([
-            fetch(`${API_BASE}/dashboard/stats`, {
-                headers: { 
-                    'Authorization': `Bearer ${authToken}`,
-                    'Content-Type': 'application/json'
-                }
-            }),
-            fetch(`${API_BASE}/tasks?limit=5`, {
-                headers: { 'Authorization': `Bearer ${authToken}` }
-            })
+            fetchConditional(`${API_BASE}/dashboard/stats`),
+            fetchConditional(`${API_BASE}/tasks?limit=5&shape=normalized`)
         ]);
         
         if (statsResponse.ok) {
@@ -264,7 +429,7 @@ async function loadDashboard() {
         
         if (tasksResponse.ok) {
             const tasksData = await tasksResponse.json();
-            updateRecentTasks(tasksData.tasks.slice(0, 5));
+            updateRecentTasks(withUsers(tasksData.tasks, tasksData.users).slice(0, 5));
         }
     } catch (error) {
         console.error('Dashboard load error:', error);
@@ -295,15 +460,49 @@ function updateRecentTasks(tasks) {
 }
 
 // Tasks
-async function loadTasks() {
+
+// Normalized task lists reference users by id; attach them for rendering
+function withUsers(tasks, users) {
+    return tasks.map(task => ({
+        ...task,
+        assignee: users[task.assignee_uid] || null,
+        creator: users[task.created_by_uid] || null
+    }));
+}
+
+async function loadTasks(cursor = null) {
     try {
         const statusFilter = document.getElementById('status-filter').value;
         const url = new URL(`${window.location.origin}${API_BASE}/tasks`);
+        url.searchParams.append('shape', 'normalized');
         
         if (statusFilter) {
             url.searchParams.append('status', statusFilter);
         }
         
+        if (cursor) {
+            url.searchParams.append('cursor', cursor);
+        }
+        
+        const response = await fetchConditional(url);
+        
+        if (response.ok) {
+            const data = await response.json();
+            updateTasksList(withUsers(data.tasks, data.users), data.next_cursor, Boolean(cursor));
+        } else {
+            showNotification('Failed to load tasks', 'error');
+        }
+    } catch (error) {
+        console.error('Tasks load error:', error);
+        showNotification('Failed to load tasks', 'error');
+    }
+}
+
+async function searchTasks(query) {
+    try {
+        const url = new URL(`${window.location.origin}${API_BASE}/tasks/search`);
+        url.searchParams.append('q', query);
+        
         const response = await fetch(url, {
             headers: { 'Authorization': `Bearer ${authToken}` }
         });
@@ -312,19 +511,27 @@ async function loadTasks() {
             const data = await response.json();
             updateTasksList(data.tasks);
         } else {
-            showNotification('Failed to load tasks', 'error');
+            showNotification('Search failed', 'error');
         }
     } catch (error) {
-        console.error('Tasks load error:', error);
-        showNotification('Failed to load tasks', 'error');
+        console.error('Task search error:', error);
+        showNotification('Search failed', 'error');
     }
 }
 
-function updateTasksList(tasks) {
+function updateTasksList(tasks, nextCursor = null, append = false) {
     const container = document.getElementById('tasks-list');
-    container.innerHTML = '';
     
-    if (tasks.length === 0) {
+    if (append) {
+        const loadMoreBtn = document.getElementById('load-more-tasks');
+        if (loadMoreBtn) {
+            loadMoreBtn.remove();
+        }
+    } else {
+        container.innerHTML = '';
+    }
+    
+    if (tasks.length === 0 && !append) {
         container.innerHTML = '<p class="text-muted">No tasks found</p>';
         return;
     }
@@ -333,11 +540,22 @@ function updateTasksList(tasks) {
         const taskElement = createTaskCard(task);
         container.appendChild(taskElement);
     });
+    
+    // Fetch the next page on demand
+    if (nextCursor) {
+        const loadMoreBtn = document.createElement('button');
+        loadMoreBtn.id = 'load-more-tasks';
+        loadMoreBtn.className = 'btn btn-secondary';
+        loadMoreBtn.textContent = 'Load more';
+        loadMoreBtn.addEventListener('click', () => loadTasks(nextCursor));
+        container.appendChild(loadMoreBtn);
+    }
 }
 
 function createTaskCard(task) {
     const card = document.createElement('div');
     card.className = 'task-card';
+    card.dataset.taskId = task.id;
     card.onclick = () => openTaskModal(task);
     
     const dueDate = task.due_date ? new Date(task.due_date).toLocaleDateString() : 'No due date';
@@ -369,9 +587,7 @@ async function loadUsers() {
     }
     
     try {
-        const response = await fetch(`${API_BASE}/users`, {
-            headers: { 'Authorization': `Bearer ${authToken}` }
-        });
+        const response = await fetchConditional(`${API_BASE}/users`);
         
         if (response.ok) {
             const data = await response.json();
@@ -537,6 +753,7 @@ function openTaskModal(task = null) {
             
             <div class="form-group admin-only ${currentUser && ['admin', 'superadmin'].includes(currentUser.role) ? 'show' : ''}">
                 <label for="task-assignee">Assignee</label>
+                <input type="search" id="task-assignee-search" placeholder="Type to find a user...">
                 <select id="task-assignee" name="assignee_uid">
                     <option value="">Unassigned</option>
                 </select>
@@ -551,9 +768,16 @@ function openTaskModal(task = null) {
         </form>
     `;
     
-    // Load users for assignee dropdown
+    // Load users for assignee dropdown, narrowed as the admin types
     if (currentUser && ['admin', 'superadmin'].includes(currentUser.role)) {
-        loadUsersForSelect('task-assignee', task ? task.assignee_uid : null);
+        const currentAssignee = task && task.assignee ? task.assignee : null;
+        loadUsersForSelect('task-assignee', currentAssignee);
+        
+        let lookupTimer = null;
+        document.getElementById('task-assignee-search').addEventListener('input', (e) => {
+            clearTimeout(lookupTimer);
+            lookupTimer = setTimeout(() => loadUsersForSelect('task-assignee', null, e.target.value.trim()), 150);
+        });
     }
     
     // Setup form handler
@@ -730,9 +954,12 @@ async function handleUserSubmit(e, user) {
 }
 
 // Helper functions
-async function loadUsersForSelect(selectId, selectedUserId = null) {
+async function loadUsersForSelect(selectId, selectedUser = null, prefix = '') {
     try {
-        const response = await fetch(`${API_BASE}/users`, {
+        const url = new URL(`${window.location.origin}${API_BASE}/users/lookup`);
+        url.searchParams.append('prefix', prefix);
+        
+        const response = await fetch(url, {
             headers: { 'Authorization': `Bearer ${authToken}` }
         });
         
@@ -740,16 +967,27 @@ async function loadUsersForSelect(selectId, selectedUserId = null) {
             const data = await response.json();
             const select = document.getElementById(selectId);
             
+            // Keep the current choice available even if it is not among the matches
+            const current = select.selectedIndex > 0 ? select.options[select.selectedIndex] : null;
+            if (!selectedUser && current) {
+                selectedUser = { id: Number(current.value), display_name: current.textContent };
+            }
+            
             // Clear existing options except the first one
             while (select.children.length > 1) {
                 select.removeChild(select.lastChild);
             }
             
-            data.users.forEach(user => {
+            const users = data.users;
+            if (selectedUser && !users.some(user => user.id === selectedUser.id)) {
+                users.unshift(selectedUser);
+            }
+            
+            users.forEach(user => {
                 const option = document.createElement('option');
                 option.value = user.id;
                 option.textContent = user.display_name;
-                if (user.id === selectedUserId) {
+                if (selectedUser && user.id === selectedUser.id) {
                     option.selected = true;
                 }
                 select.appendChild(option);
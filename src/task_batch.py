@@ -0,0 +1,202 @@
+from datetime import datetime
+from src.models.user import User, db
+from src.models.task import Task, TaskUpdate, TaskStats
+from src.models.change import ChangeStamp, TaskTombstone
+from src.models.event import TaskEvent
+from src.models.upload import UploadBlob
+
+# Largest number of operations accepted in one batch request
+MAX_BATCH_SIZE = 1000
+
+VALID_STATUSES = ['pending', 'in_progress', 'completed', 'cancelled']
+VALID_PRIORITIES = ['low', 'medium', 'high', 'urgent']
+
+class BatchItemError(ValueError):
+    """Raised for an operation that cannot be applied"""
+
+def _parse_due_date(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (ValueError, AttributeError):
+        raise BatchItemError('Invalid due date format')
+
+def _as_id(value):
+    """Coerce an id sent as a number or numeric string, None when empty"""
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise BatchItemError('Invalid id')
+
+def _task_fields(data, assignees, partial):
+    """Validate create/update fields against the preloaded assignee set"""
+    if not isinstance(data, dict):
+        raise BatchItemError('data must be an object')
+    if not partial and not data.get('title'):
+        raise BatchItemError('Title is required')
+
+    fields = {}
+    for name in ('title', 'description'):
+        if name in data:
+            fields[name] = data[name]
+    if 'status' in data:
+        if data['status'] not in VALID_STATUSES:
+            raise BatchItemError('Invalid status')
+        fields['status'] = data['status']
+    if 'priority' in data:
+        if data['priority'] not in VALID_PRIORITIES:
+            raise BatchItemError('Invalid priority')
+        fields['priority'] = data['priority']
+    if 'due_date' in data:
+        fields['due_date'] = _parse_due_date(data['due_date'])
+    if 'assignee_uid' in data:
+        assignee_uid = _as_id(data['assignee_uid'])
+        if assignee_uid is not None and assignee_uid not in assignees:
+            raise BatchItemError('Assignee not found')
+        fields['assignee_uid'] = assignee_uid
+    return fields
+
+def apply_task_batch(operations, user_id):
+    """Validate and apply create/update/delete operations in a single transaction.
+
+    Invalid operations are reported and skipped; the valid ones are written with
+    bulk statements and committed together. Returns one result per operation.
+    """
+    results = [None] * len(operations)
+
+    # Preload everything the operations reference with one IN query each
+    assignee_ids, task_ids = set(), set()
+    for op in operations:
+        if not isinstance(op, dict):
+            continue
+        try:
+            if isinstance(op.get('data'), dict):
+                assignee_ids.add(_as_id(op['data'].get('assignee_uid')))
+            if op.get('op') in ('update', 'delete'):
+                task_ids.add(_as_id(op.get('id')))
+        except BatchItemError:
+            pass
+    assignee_ids.discard(None)
+    task_ids.discard(None)
+
+    assignees = {
+        row.id for row in db.session.query(User.id).filter(User.id.in_(assignee_ids))
+    } if assignee_ids else set()
+    existing = {
+        row.id: row for row in db.session.query(Task.id, Task.assignee_uid, Task.status).filter(Task.id.in_(task_ids))
+    } if task_ids else {}
+
+    now = datetime.utcnow()
+    creates, create_indexes = [], []
+    updates, deletes = [], []
+    touched = set()
+    deltas = {}
+    events, tombstones = [], []
+
+    def bump(key, amount):
+        deltas[key] = deltas.get(key, 0) + amount
+
+    for index, op in enumerate(operations):
+        kind = op.get('op') if isinstance(op, dict) else None
+        try:
+            if kind == 'create':
+                fields = _task_fields(op.get('data'), assignees, partial=False)
+                fields.setdefault('description', '')
+                fields.setdefault('status', 'pending')
+                fields.setdefault('priority', 'medium')
+                fields.update(created_by_uid=user_id, created_at=now, updated_at=now)
+                creates.append(fields)
+                create_indexes.append(index)
+                bump(TaskStats.key(fields.get('assignee_uid'), fields['status']), 1)
+                continue
+
+            if kind not in ('update', 'delete'):
+                raise BatchItemError('op must be create, update or delete')
+
+            task_id = _as_id(op.get('id'))
+            if task_id not in existing:
+                raise BatchItemError('Task not found')
+            if task_id in touched:
+                raise BatchItemError('Task already modified in this batch')
+            current = existing[task_id]
+
+            if kind == 'update':
+                fields = _task_fields(op.get('data'), assignees, partial=True)
+                fields.update(id=task_id, updated_at=now)
+                updates.append(fields)
+                old_key = TaskStats.key(current.assignee_uid, current.status)
+                new_key = TaskStats.key(fields.get('assignee_uid', current.assignee_uid), fields.get('status', current.status))
+                if old_key != new_key:
+                    bump(old_key, -1)
+                    bump(new_key, 1)
+                assignee_uid = fields.get('assignee_uid', current.assignee_uid)
+                if current.assignee_uid is not None and current.assignee_uid != assignee_uid:
+                    tombstones.append((task_id, current.assignee_uid, False))
+                events.append({
+                    'kind': 'task_updated', 'task_id': task_id, 'assignee_uid': assignee_uid,
+                    'previous_assignee_uid': current.assignee_uid if current.assignee_uid != assignee_uid else None
+                })
+                results[index] = {'index': index, 'op': kind, 'id': task_id, 'status': 'updated'}
+            else:
+                deletes.append(task_id)
+                bump(TaskStats.key(current.assignee_uid, current.status), -1)
+                events.append({'kind': 'task_deleted', 'task_id': task_id, 'assignee_uid': current.assignee_uid})
+                tombstones.append((task_id, current.assignee_uid, True))
+                results[index] = {'index': index, 'op': kind, 'id': task_id, 'status': 'deleted'}
+            touched.add(task_id)
+
+        except BatchItemError as e:
+            results[index] = {'index': index, 'op': kind, 'status': 'error', 'error': str(e)}
+
+    try:
+        # Bulk statements skip the flush hooks, so counters, stamps, tombstones and events are written here
+        if creates or updates or deletes:
+            change_seq = ChangeStamp.bump(db.session.connection(), ['tasks'])['tasks']
+            for fields in creates + updates:
+                fields['change_seq'] = change_seq
+            TaskTombstone.record(db.session.connection(), tombstones, change_seq)
+
+        if creates:
+            # Bulk INSERT with RETURNING keeps ids in parameter order
+            new_ids = db.session.scalars(
+                db.insert(Task).returning(Task.id, sort_by_parameter_order=True), creates
+            ).all()
+            for index, fields, task_id in zip(create_indexes, creates, new_ids):
+                results[index] = {'index': index, 'op': 'create', 'id': task_id, 'status': 'created'}
+                events.append({'kind': 'task_created', 'task_id': task_id, 'assignee_uid': fields.get('assignee_uid')})
+
+        # Bulk UPDATE by primary key, grouped by the set of columns each row changes
+        groups = {}
+        for fields in updates:
+            groups.setdefault(tuple(sorted(fields)), []).append(fields)
+        for rows in groups.values():
+            db.session.execute(db.update(Task), rows)
+
+        if deletes:
+            # Bulk deletes bypass the ORM cascade, so remove the updates explicitly
+            # and release the screenshots they referenced
+            released = {}
+            for (path,) in db.session.execute(
+                db.select(TaskUpdate.screenshot_path)
+                .where(TaskUpdate.task_id.in_(deletes), TaskUpdate.screenshot_path.isnot(None))
+            ):
+                released[path] = released.get(path, 0) - 1
+            UploadBlob.apply_deltas(db.session.connection(), released)
+            db.session.execute(db.delete(TaskUpdate).where(TaskUpdate.task_id.in_(deletes)),
+                               execution_options={'synchronize_session': False})
+            db.session.execute(db.delete(Task).where(Task.id.in_(deletes)),
+                               execution_options={'synchronize_session': False})
+
+        if any(deltas.values()):
+            TaskStats.apply_deltas(db.session.connection(), deltas)
+        TaskEvent.record(db.session.connection(), events)
+
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return results
@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta
+from threading import Event, Lock, Thread
+import logging
+import os
+import click
+from flask.cli import with_appcontext
+from src.models.user import db
+from src.models.upload import UploadBlob, ThumbnailJob
+from src.models.change import ChangeStamp
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it updates keep pointing at the originals
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Derivatives as (blob column, file suffix, longest side in pixels)
+DERIVATIVES = [
+    ('thumbnail_path', 'thumb', 320),
+    ('preview_path', 'preview', 1280),
+]
+WEBP_QUALITY = 80
+
+# A claimed job is given back to the queue if its worker has not finished within the lease
+JOB_LEASE = timedelta(minutes=5)
+MAX_ATTEMPTS = 3
+# A failed job waits this long, doubled per attempt, before it is claimed again
+RETRY_BACKOFF = timedelta(seconds=15)
+# How often idle workers look for jobs queued by other processes
+POLL_INTERVAL = 5
+
+def derivative_path(path, suffix):
+    """Path of a derivative next to its original, e.g. uploads/ab/cd/<hash>.thumb.webp"""
+    return f"{path.rsplit('.', 1)[0]}.{suffix}.webp"
+
+def render_derivatives(source, targets):
+    """Write a WebP copy of an image scaled to each (target path, longest side)"""
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        for target, size in targets:
+            copy = image.copy()
+            copy.thumbnail((size, size))
+            partial = f'{target}.part'
+            copy.save(partial, 'WEBP', quality=WEBP_QUALITY)
+            os.replace(partial, target)
+
+def process_job(job_id, sha256, attempts, static_folder):
+    """Generate the derivatives of one claimed job and record the outcome"""
+    job = db.session.get(ThumbnailJob, job_id)
+    blob = db.session.get(UploadBlob, sha256)
+    try:
+        if blob is not None:
+            paths = {column: derivative_path(blob.path, suffix) for column, suffix, _ in DERIVATIVES}
+            render_derivatives(os.path.join(static_folder, blob.path), [
+                (os.path.join(static_folder, paths[column]), size) for column, _, size in DERIVATIVES
+            ])
+            for column, path in paths.items():
+                setattr(blob, column, path)
+            # Update payloads now carry the derivative paths, so cached task responses are stale
+            ChangeStamp.bump(db.session.connection(), ['tasks'])
+        job.status = 'done'
+        job.last_error = None
+        job.locked_until = None
+    except Exception as e:
+        logger.warning('Thumbnail job %s failed: %s', job_id, e)
+        db.session.rollback()
+        job = db.session.get(ThumbnailJob, job_id)
+        job.status = 'pending' if attempts < MAX_ATTEMPTS else 'failed'
+        job.last_error = str(e)
+        # Not claimed again before then, so a file that is not visible yet has time to appear
+        job.locked_until = datetime.utcnow() + RETRY_BACKOFF * 2 ** attempts if job.status == 'pending' else None
+    db.session.commit()
+
+class ThumbnailWorker:
+    """Per-process pool of threads draining the thumbnail job table.
+
+    Uploads wake the pool of their own process; jobs queued by other
+    processes, or left behind by a crashed one, are picked up by polling.
+    """
+
+    def __init__(self, workers=1, poll_interval=POLL_INTERVAL):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._app = None
+        self._threads = []
+        self._pid = None
+        self._wakeup = Event()
+        self._lock = Lock()
+
+    def init_app(self, app):
+        self._app = app
+        self.workers = app.config.get('THUMBNAIL_WORKERS', self.workers)
+        # Started from the first request so forked server workers each get their own threads
+        app.before_request(self.ensure_started)
+
+    @property
+    def enabled(self):
+        return Image is not None and self.workers > 0
+
+    def ensure_started(self):
+        if not self.enabled or (self._pid == os.getpid() and all(t.is_alive() for t in self._threads)):
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._threads = []
+                self._pid = os.getpid()
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = Thread(target=self._run, name='thumbnail-worker', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def wake(self):
+        """Signal that a job was queued"""
+        self._wakeup.set()
+
+    def run_once(self):
+        """Claim and process one job; returns False when the queue is empty"""
+        with db.engine.begin() as connection:
+            job = ThumbnailJob.claim(connection, JOB_LEASE)
+        if job is None:
+            return False
+        process_job(job.id, job.sha256, job.attempts, self._app.static_folder)
+        return True
+
+    def _run(self):
+        while True:
+            try:
+                with self._app.app_context():
+                    while self.run_once():
+                        pass
+            except Exception:
+                logger.exception('Thumbnail worker failed')
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+thumbnail_worker = ThumbnailWorker()
+
+@click.command('thumbnails')
+@click.option('--backfill', is_flag=True, help='Queue stored uploads that have no derivatives yet.')
+@with_appcontext
+def thumbnails_command(backfill):
+    """Generate pending screenshot thumbnails in the foreground."""
+    if Image is None:
+        raise click.ClickException('Pillow is not installed')
+    if backfill:
+        missing = db.session.query(UploadBlob.sha256).filter(UploadBlob.thumbnail_path.is_(None)).all()
+        with db.engine.begin() as connection:
+            for (sha256,) in missing:
+                ThumbnailJob.enqueue(connection, sha256, retry=True)
+    processed = 0
+    while thumbnail_worker.run_once():
+        processed += 1
+    click.echo(f'Processed {processed} thumbnail job(s)')
@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta
+import hashlib
+import os
+import tempfile
+import click
+from flask import Request, current_app
+from flask.cli import with_appcontext
+from src.models.user import db
+from src.models.upload import UploadBlob, ThumbnailJob
+from src.thumbnails import thumbnail_worker
+
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'}
+
+# Unreferenced blobs younger than this are kept, so an upload whose update
+# is still being written is not reaped underneath it
+UPLOAD_REAP_GRACE = timedelta(hours=1)
+
+def upload_folder():
+    return current_app.config['UPLOAD_FOLDER']
+
+def allowed_file(filename):
+    """Check if file extension is allowed"""
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+class HashingFile:
+    """Temporary file in the upload folder that hashes the chunks written to it"""
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        fd, self.name = tempfile.mkstemp(dir=directory, suffix='.part')
+        self._file = os.fdopen(fd, 'w+b')
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self._hash.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def commit(self, path):
+        """Move the file to its final path; it is on the same filesystem, so this is a rename"""
+        if self.name is None:
+            # Already moved by an earlier attempt of a retried request
+            return
+        self._file.close()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(self.name, path)
+        self.name = None
+
+    def close(self):
+        """Close and discard the file unless it was committed"""
+        self._file.close()
+        if self.name:
+            try:
+                os.unlink(self.name)
+            except FileNotFoundError:
+                pass
+            self.name = None
+
+class UploadRequest(Request):
+    """Request that streams file parts to disk in chunks while hashing them"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingFile(os.path.join(upload_folder(), 'tmp'))
+
+def blob_path(sha256, extension):
+    """Sharded path of a blob relative to the static folder, e.g. uploads/ab/cd/<hash>.png"""
+    return f'uploads/{sha256[:2]}/{sha256[2:4]}/{sha256}.{extension}'
+
+def store_upload(file):
+    """Store an uploaded file by content hash and return its path, or None if it is not allowed"""
+    if not file or not allowed_file(file.filename):
+        return None
+
+    stream = file.stream
+    if not isinstance(stream, HashingFile):
+        # Files not parsed by UploadRequest are copied through the hasher
+        stream = HashingFile(os.path.join(upload_folder(), 'tmp'))
+        for chunk in iter(lambda: file.stream.read(64 * 1024), b''):
+            stream.write(chunk)
+
+    sha256 = stream.hexdigest()
+    extension = file.filename.rsplit('.', 1)[1].lower()
+    # Registered in its own transaction: if the update is never written the
+    # blob stays unreferenced and the reaper removes it
+    with db.engine.begin() as connection:
+        path, created = UploadBlob.ensure(connection, sha256, blob_path(sha256, extension), stream.size)
+
+    # Replacing an existing copy is harmless (same bytes) and restores a file
+    # the reaper removed just before the blob was registered again
+    stream.commit(os.path.join(os.path.dirname(upload_folder()), path))
+
+    if created:
+        # Queued only once the file is in place; the workers never block the request
+        with db.engine.begin() as connection:
+            ThumbnailJob.enqueue(connection, sha256)
+        thumbnail_worker.wake()
+    return path
+
+def reap_uploads(grace=UPLOAD_REAP_GRACE):
+    """Delete blobs no update references any more; returns how many were removed"""
+    cutoff = datetime.utcnow() - grace
+    static_folder = os.path.dirname(upload_folder())
+    removed = 0
+    orphans = UploadBlob.query.filter(UploadBlob.ref_count <= 0, UploadBlob.last_used_at < cutoff).all()
+    for blob in orphans:
+        # Re-check under the write lock in case the blob was reused meanwhile, and
+        # unlink before committing so a concurrent re-upload waits and writes it back
+        deleted = UploadBlob.query.filter(
+            UploadBlob.sha256 == blob.sha256, UploadBlob.ref_count <= 0, UploadBlob.last_used_at < cutoff
+        ).delete(synchronize_session=False)
+        if deleted:
+            ThumbnailJob.query.filter_by(sha256=blob.sha256).delete(synchronize_session=False)
+            for path in (blob.path, blob.thumbnail_path, blob.preview_path):
+                if path:
+                    try:
+                        os.unlink(os.path.join(static_folder, path))
+                    except FileNotFoundError:
+                        pass
+            removed += 1
+        db.session.commit()
+    return removed
+
+@click.command('reap-uploads')
+@click.option('--grace-minutes', default=int(UPLOAD_REAP_GRACE.total_seconds() // 60), show_default=True,
+              help='Keep unreferenced uploads younger than this.')
+@with_appcontext
+def reap_uploads_command(grace_minutes):
+    """Delete stored uploads that no task update references."""
+    removed = reap_uploads(timedelta(minutes=grace_minutes))
+    click.echo(f'Removed {removed} unreferenced upload(s)')
@@ -0,0 +1,56 @@
+from bisect import bisect_left
+from threading import Lock
+import time
+from src.models.user import User, db
+
+# Other workers cannot see our invalidations, so the index is also rebuilt periodically
+USER_INDEX_TTL = 60
+
+class UserPrefixIndex:
+    """Sorted in-memory index of active users by username and display name words"""
+
+    def __init__(self, ttl=USER_INDEX_TTL):
+        self.ttl = ttl
+        self._keys = []
+        self._entries = []
+        self._expires = 0
+        self._lock = Lock()
+
+    def _build(self):
+        rows = db.session.query(User.id, User.username, User.display_name) \
+            .filter(User.is_active.is_(True)).all()
+        index = []
+        for user_id, username, display_name in rows:
+            names = {username.lower(), display_name.lower()}
+            names.update(display_name.lower().split())
+            index.extend((name, display_name, user_id) for name in names)
+        index.sort()
+        self._keys = [name for name, _, _ in index]
+        self._entries = [(user_id, display_name) for _, display_name, user_id in index]
+        self._expires = time.monotonic() + self.ttl
+
+    def lookup(self, prefix, limit=10):
+        """Return up to limit {id, display_name} rows whose name or username starts with prefix"""
+        prefix = prefix.strip().lower()
+        with self._lock:
+            if time.monotonic() >= self._expires:
+                self._build()
+            keys, entries = self._keys, self._entries
+
+        results = []
+        seen = set()
+        position = bisect_left(keys, prefix)
+        while position < len(keys) and keys[position].startswith(prefix) and len(results) < limit:
+            user_id, display_name = entries[position]
+            if user_id not in seen:
+                seen.add(user_id)
+                results.append({'id': user_id, 'display_name': display_name})
+            position += 1
+        return results
+
+    def invalidate(self):
+        """Force a rebuild on the next lookup"""
+        with self._lock:
+            self._expires = 0
+
+user_index = UserPrefixIndex()
@@ -0,0 +1,62 @@
+import pytest
+from src.main import create_app
+from src.authorization import user_cache
+from src.models.user import User, db
+from src.models.task import Task
+from src.seed import SEED_PASSWORD, generate_dataset
+
+pytest_plugins = ['tests.query_budget']
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """One app over a generated dataset for the whole session"""
+    folder = tmp_path_factory.mktemp('app')
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{folder / 'app.db'}",
+        'UPLOAD_FOLDER': str(folder / 'uploads'),
+        'INIT_DB_ON_START': True,
+        # Cheap hashes; the work factor is not what these tests measure
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+        'THUMBNAIL_WORKERS': 0,
+    })
+    with app.app_context():
+        generate_dataset(users=8, tasks=60, updates=2, seed=1)
+    return app
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture(scope='session')
+def dataset(app):
+    """Ids the tests draw from; the plain user is the busiest assignee"""
+    with app.app_context():
+        user = db.session.query(User).join(Task, Task.assignee_uid == User.id) \
+            .filter(User.role == 'user', User.is_active.is_(True)) \
+            .group_by(User.id).order_by(db.func.count(Task.id).desc()).first()
+        task = Task.query.filter(Task.assignee_uid == user.id).first()
+        other = User.query.filter(User.role == 'user', User.id != user.id).first()
+        admin = User.query.filter_by(username='admin').first()
+        return {'admin_id': admin.id, 'user_id': user.id, 'username': user.username, 'task_id': task.id,
+                'other_user_id': other.id}
+
+@pytest.fixture(scope='session')
+def tokens(app, dataset):
+    client = app.test_client()
+    admin = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'}).get_json()
+    user = client.post('/api/auth/login', json={'username': dataset['username'], 'password': SEED_PASSWORD}).get_json()
+    tokens = {
+        'admin': {'Authorization': f"Bearer {admin['access_token']}"},
+        'user': {'Authorization': f"Bearer {user['access_token']}"},
+        'refresh': {'Authorization': f"Bearer {admin['refresh_token']}"},
+    }
+    return tokens
+
+@pytest.fixture(autouse=True)
+def warm_user_cache(app, dataset):
+    """Budgets are for requests by callers whose user record is cached, as nearly all are"""
+    with app.app_context():
+        user_cache.clear()
+        for user_id in (dataset['admin_id'], dataset['user_id']):
+            user_cache.get(user_id)
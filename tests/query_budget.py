@@ -0,0 +1,103 @@
+"""SQL statement budgets for endpoints, as a pytest plugin.
+
+Statements are counted with SQLAlchemy's before_cursor_execute event, on
+the calling thread only, so the event hub and thumbnail threads sharing
+the engine are not counted. Use the query_budget fixture around requests:
+
+    def test_list(client, query_budget):
+        with query_budget(3) as counter:
+            client.get('/api/tasks')
+
+or mark a whole test, which needs an `app` fixture:
+
+    @pytest.mark.query_budget(2)
+    def test_stats(client): ...
+
+Going over the budget fails with the statements that were issued.
+"""
+import threading
+import pytest
+from flask import request, request_started
+from sqlalchemy import event
+from src.models.user import db
+
+# Longest statement shown in a failure
+STATEMENT_CHARS = 300
+
+class QueryBudgetExceeded(AssertionError):
+    """More SQL statements than budgeted"""
+
+def format_statements(statements):
+    return '\n'.join(
+        f'  {number:>3}. {" ".join(statement.split())[:STATEMENT_CHARS]}'
+        for number, statement in enumerate(statements, 1)
+    )
+
+class QueryCounter:
+    """Collects the SQL statements the current thread sends to an engine, and the URL rules it requests"""
+
+    def __init__(self, app, budget=None, label=None):
+        self.app = app
+        self.budget = budget
+        self.label = label
+        self.statements = []
+        self.rules = []
+        self._thread = None
+        with app.app_context():
+            self.engine = db.engine
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _record_statement(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == self._thread:
+            self.statements.append(statement)
+
+    def _record_rule(self, sender, **extra):
+        if threading.get_ident() == self._thread:
+            self.rules.append((request.method, request.url_rule.rule if request.url_rule else None))
+
+    def __enter__(self):
+        self._thread = threading.get_ident()
+        event.listen(self.engine, 'before_cursor_execute', self._record_statement)
+        request_started.connect(self._record_rule, self.app)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        event.remove(self.engine, 'before_cursor_execute', self._record_statement)
+        request_started.disconnect(self._record_rule, self.app)
+        if exc_type is None and self.budget is not None:
+            self.check()
+        return False
+
+    def check(self):
+        if self.count > self.budget:
+            label = self.label or ', '.join(f'{method} {rule}' for method, rule in dict.fromkeys(self.rules)) \
+                or 'Block'
+            raise QueryBudgetExceeded(
+                f'{label} issued {self.count} SQL statements, budget {self.budget}:\n'
+                f'{format_statements(self.statements)}'
+            )
+
+@pytest.fixture
+def query_budget(app):
+    """query_budget(n, label=None) counts the statements of a with block and fails above n"""
+    def budget(limit, label=None):
+        return QueryCounter(app, limit, label)
+    return budget
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'query_budget(n): fail if the test body issues more than n SQL statements')
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    marker = item.get_closest_marker('query_budget')
+    if marker is None:
+        return (yield)
+    app = item.funcargs.get('app')
+    if app is None:
+        raise pytest.UsageError(f'{item.nodeid}: the query_budget marker needs the app fixture')
+    # A failing test is reported as such; the budget is checked only when the body passed
+    with QueryCounter(app, marker.args[0], label=item.name):
+        return (yield)
@@ -0,0 +1,15 @@
+import pytest
+from flask import g
+from sqlalchemy.exc import OperationalError
+from src.metrics import metrics
+from src.models.user import db
+
+def test_failed_statements_are_counted(app):
+    with app.test_request_context('/api/tasks'):
+        metrics.start_request()
+        with pytest.raises(OperationalError):
+            db.session.execute(db.text('SELECT * FROM no_such_table'))
+        db.session.rollback()
+        db.session.execute(db.text('SELECT 1'))
+        assert g.sql_queries == 2
+        db.session.remove()
@@ -0,0 +1,52 @@
+"""Upgrading a database created before the delta sync migration."""
+from src.main import create_app
+from src.migrations import upgrade
+from src.models.user import db
+from src.models.task import Task
+from src.models.change import ChangeStamp
+from src.seed import generate_dataset
+
+def at_version_3(app):
+    """Strip what migration 4 adds, leaving tasks as the baseline schema stored them"""
+    with app.app_context():
+        generate_dataset(users=2, tasks=5, updates=0, seed=3)
+        with db.engine.begin() as connection:
+            connection.execute(db.text('DROP INDEX ix_task_change_seq'))
+            connection.execute(db.text('DROP INDEX ix_task_assignee_change_seq'))
+            connection.execute(db.text('ALTER TABLE task DROP COLUMN change_seq'))
+            connection.execute(db.text("DELETE FROM change_stamps WHERE scope = 'tasks'"))
+            connection.execute(db.text('DELETE FROM schema_migrations WHERE version >= 4'))
+        db.session.remove()
+
+def test_first_sync_after_upgrade_returns_existing_tasks(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'app.db'}",
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'INIT_DB_ON_START': True,
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+        'THUMBNAIL_WORKERS': 0,
+    })
+    at_version_3(app)
+    with app.app_context():
+        assert [version for version, _ in upgrade()] == [4, 5]
+        seqs = [task.change_seq for task in Task.query.all()]
+        assert len(set(seqs)) == 5
+        assert ChangeStamp.current()['tasks'] == max(seqs)
+
+    client = app.test_client()
+    login = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'}).get_json()
+    headers = {'Authorization': f"Bearer {login['access_token']}"}
+
+    # A new client has nothing to apply a delta to, so it is told to reload
+    changes = client.get('/api/tasks/changes?since=0', headers=headers).get_json()
+    assert changes['reset'] is True
+    tasks = client.get('/api/tasks?limit=100', headers=headers).get_json()['tasks']
+    assert len(tasks) == 5
+
+    # From the returned seq on, only later writes come back
+    task_id = tasks[0]['id']
+    client.put(f'/api/tasks/{task_id}', headers=headers, json={'status': 'completed'})
+    delta = client.get(f"/api/tasks/changes?since={changes['seq']}", headers=headers).get_json()
+    assert delta['reset'] is False
+    assert [task['id'] for task in delta['tasks']] == [task_id]
@@ -0,0 +1,13 @@
+"""The query_budget marker of tests/query_budget.py."""
+import pytest
+from tests.query_budget import QueryBudgetExceeded
+
+@pytest.mark.query_budget(2)
+def test_marker_passes_within_budget(app, client, tokens):
+    assert client.get('/api/dashboard/stats', headers=tokens['admin']).status_code == 200
+
+@pytest.mark.xfail(raises=QueryBudgetExceeded, strict=True)
+@pytest.mark.query_budget(1)
+def test_marker_fails_over_budget(app, client, tokens):
+    client.get('/api/dashboard/stats', headers=tokens['admin'])
+    client.get('/api/dashboard/stats', headers=tokens['user'])
@@ -0,0 +1,154 @@
+"""SQL statement budgets of every route in auth_bp, user_bp and task_bp.
+
+A budget is the most statements a request may issue. List endpoints are
+also checked against a grown dataset, since their count must not depend
+on the number of rows.
+"""
+import itertools
+import pytest
+from src.models.user import db
+from src.models.change import ChangeStamp
+from src.seed import SEED_PASSWORD, generate_dataset
+
+BUDGETED_BLUEPRINTS = ('auth', 'user', 'task')
+
+_names = itertools.count()
+
+class Case:
+    """One request to a route and its budget; build(client, tokens, dataset) returns the path and body"""
+
+    def __init__(self, method, rule, budget, build, caller='admin', variant=None, scales=False, stream=False):
+        self.method = method
+        self.rule = rule
+        self.budget = budget
+        self.build = build
+        self.caller = caller
+        self.variant = variant
+        # List endpoints, whose statement count must not grow with the rows
+        self.scales = scales
+        # Event streams never end; only the request up to the response is counted
+        self.stream = stream
+
+    @property
+    def id(self):
+        return f'{self.method} {self.rule}' + (f' ({self.variant})' if self.variant else '')
+
+def fixed(path, **body):
+    return lambda client, tokens, dataset: (path, body)
+
+def new_user(client, tokens):
+    number = next(_names)
+    response = client.post('/api/users', headers=tokens['admin'], json={
+        'username': f'budget_user_{number}', 'email': f'budget_user_{number}@example.com',
+        'password': SEED_PASSWORD, 'display_name': f'Budget User {number}'})
+    return response.get_json()['user']['id']
+
+def new_task(client, tokens, dataset):
+    response = client.post('/api/tasks', headers=tokens['admin'],
+                           json={'title': 'Budget task', 'assignee_uid': dataset['user_id']})
+    return response.get_json()['task']['id']
+
+def recent_changes(client, tokens, dataset):
+    # Since the last write but one, so the delta holds rows rather than a reset
+    with client.application.app_context():
+        seq = ChangeStamp.current()['tasks']
+    return f'/api/tasks/changes?since={seq - 1}', {}
+
+CASES = [
+    # auth_bp
+    Case('POST', '/api/auth/login', 1, lambda client, tokens, dataset: (
+        '/api/auth/login', {'json': {'username': dataset['username'], 'password': SEED_PASSWORD}})),
+    Case('POST', '/api/auth/refresh', 1, fixed('/api/auth/refresh'), caller='refresh'),
+    Case('GET', '/api/auth/me', 1, fixed('/api/auth/me'), caller='user'),
+    Case('POST', '/api/auth/change-password', 3, fixed(
+        '/api/auth/change-password', json={'current_password': SEED_PASSWORD, 'new_password': SEED_PASSWORD}),
+        caller='user'),
+    Case('PUT', '/api/auth/update-profile', 4, fixed('/api/auth/update-profile', json={'display_name': 'Budget'}),
+         caller='user'),
+    # user_bp
+    Case('GET', '/api/users', 2, fixed('/api/users'), scales=True),
+    Case('POST', '/api/users', 5, lambda client, tokens, dataset: ('/api/users', {'json': {
+        'username': f'budget_new_{next(_names)}', 'email': f'budget_new_{next(_names)}@example.com',
+        'password': SEED_PASSWORD, 'display_name': 'Budget New'}})),
+    Case('GET', '/api/users/<int:user_id>', 1, lambda client, tokens, dataset: (
+        f"/api/users/{dataset['other_user_id']}", {})),
+    Case('PUT', '/api/users/<int:user_id>', 4, lambda client, tokens, dataset: (
+        f"/api/users/{dataset['other_user_id']}", {'json': {'display_name': 'Budget Renamed'}})),
+    Case('DELETE', '/api/users/<int:user_id>', 4, lambda client, tokens, dataset: (
+        f'/api/users/{new_user(client, tokens)}', {})),
+    Case('GET', '/api/users/lookup', 1, fixed('/api/users/lookup?prefix=seed'), scales=True),
+    Case('GET', '/api/users/search', 1, fixed('/api/users/search?q=seed'), scales=True),
+    # task_bp
+    Case('GET', '/api/tasks', 3, fixed('/api/tasks?limit=500'), scales=True),
+    Case('GET', '/api/tasks', 3, fixed('/api/tasks?limit=500'), caller='user', variant='user', scales=True),
+    Case('GET', '/api/tasks', 3, fixed('/api/tasks?limit=500&shape=normalized'), variant='normalized',
+         scales=True),
+    Case('GET', '/api/tasks', 3, fixed('/api/tasks?limit=500&fields=id,title,assignee_uid'), variant='fields',
+         scales=True),
+    Case('GET', '/api/tasks/changes', 4, recent_changes, scales=True),
+    Case('GET', '/api/tasks/search', 1, fixed('/api/tasks/search?q=backup&limit=500'), scales=True),
+    Case('GET', '/api/tasks/export', 2, fixed('/api/tasks/export?format=ndjson'), scales=True),
+    # One query for the updates of every EXPORT_BATCH_SIZE tasks, so not checked against a grown dataset
+    Case('GET', '/api/tasks/export', 3, fixed('/api/tasks/export?format=csv&include_updates=true'),
+         variant='updates'),
+    Case('GET', '/api/events', 1, fixed('/api/events'), caller='user', stream=True),
+    Case('POST', '/api/tasks', 9, lambda client, tokens, dataset: ('/api/tasks', {'json': {
+        'title': 'Budget task', 'assignee_uid': dataset['user_id']}})),
+    # SQLite cannot return the ids of a multi-row INSERT in parameter order, so each create is its own
+    # INSERT: 6 statements plus one per create
+    Case('POST', '/api/tasks/batch', 26, lambda client, tokens, dataset: ('/api/tasks/batch', {'json': {'operations': [
+        {'op': 'create', 'data': {'title': f'Budget batch {i}', 'assignee_uid': dataset['user_id']}} for i in range(20)
+    ] + [{'op': 'update', 'id': dataset['task_id'], 'data': {'priority': 'high'}}]}})),
+    Case('GET', '/api/tasks/<int:task_id>', 3, lambda client, tokens, dataset: (
+        f"/api/tasks/{dataset['task_id']}", {})),
+    Case('GET', '/api/tasks/<int:task_id>', 4, lambda client, tokens, dataset: (
+        f"/api/tasks/{dataset['task_id']}?shape=normalized", {}), variant='normalized'),
+    Case('PUT', '/api/tasks/<int:task_id>', 10, lambda client, tokens, dataset: (
+        f"/api/tasks/{dataset['task_id']}", {'json': {'status': 'in_progress'}}), caller='user'),
+    Case('POST', '/api/tasks/<int:task_id>/updates', 8, lambda client, tokens, dataset: (
+        f"/api/tasks/{dataset['task_id']}/updates", {'data': {'comment': 'Budget update'}}), caller='user'),
+    Case('DELETE', '/api/tasks/<int:task_id>', 8, lambda client, tokens, dataset: (
+        f'/api/tasks/{new_task(client, tokens, dataset)}', {})),
+    Case('GET', '/api/dashboard/stats', 2, fixed('/api/dashboard/stats'), scales=True),
+    Case('GET', '/api/dashboard/stats', 2, fixed('/api/dashboard/stats'), caller='user', variant='user',
+         scales=True),
+]
+
+def send(client, case, tokens, dataset, query_budget):
+    """Issue the case's request within its budget and check it reached the declared route"""
+    path, body = case.build(client, tokens, dataset)
+    with query_budget(case.budget, label=case.id) as counter:
+        response = client.open(path, method=case.method, headers=tokens[case.caller],
+                               buffered=not case.stream, **body)
+        if not case.stream:
+            # Streamed exports run their queries while the body is read
+            response.get_data()
+        response.close()
+    assert response.status_code < 400, response.get_data(as_text=True)
+    assert (case.method, case.rule) in counter.rules
+    return counter.count
+
+@pytest.mark.parametrize('case', CASES, ids=lambda case: case.id)
+def test_query_budget(client, case, tokens, dataset, query_budget):
+    send(client, case, tokens, dataset, query_budget)
+
+@pytest.mark.parametrize('case', [case for case in CASES if case.scales], ids=lambda case: case.id)
+def test_list_queries_do_not_grow_with_rows(app, client, case, tokens, dataset, query_budget):
+    # Warm per-process caches first, so both counts are taken alike
+    send(client, case, tokens, dataset, query_budget)
+    before = send(client, case, tokens, dataset, query_budget)
+    with app.app_context():
+        generate_dataset(users=3, tasks=120, updates=3, seed=next(_names) + 100)
+        db.session.remove()
+    after = send(client, case, tokens, dataset, query_budget)
+    assert after <= before, f'{case.id} issued {before} statements before and {after} after adding 120 tasks'
+
+def test_every_route_has_a_budget(app):
+    routes = {
+        (method, rule.rule)
+        for rule in app.url_map.iter_rules()
+        if rule.endpoint.split('.')[0] in BUDGETED_BLUEPRINTS
+        for method in rule.methods - {'HEAD', 'OPTIONS'}
+    }
+    budgeted = {(case.method, case.rule) for case in CASES}
+    assert not routes - budgeted, f'Routes without a query budget: {sorted(routes - budgeted)}'
@@ -0,0 +1,16 @@
+from src.models.user import User, db
+from src.models.task import Task
+from src.seed import generate_dataset
+
+def test_tasks_only_go_to_existing_users(app):
+    with app.app_context():
+        users = db.session.query(db.func.count(User.id)).scalar()
+        before = db.session.query(db.func.max(Task.id)).scalar()
+        counts = generate_dataset(users=0, tasks=20, updates=1, seed=7)
+        assert counts['tasks'] == 20
+        assert db.session.query(db.func.count(User.id)).scalar() == users
+        tasks = Task.query.filter(Task.id > before).all()
+        assert len(tasks) == 20
+        creators = {task.created_by_uid for task in tasks}
+        assert all(db.session.get(User, uid).is_active and db.session.get(User, uid).has_role('admin') for uid in creators)
+        db.session.remove()
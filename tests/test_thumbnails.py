@@ -0,0 +1,29 @@
+from datetime import datetime
+from src.models.user import db
+from src.models.upload import UploadBlob, ThumbnailJob
+from src.thumbnails import ThumbnailWorker
+
+def test_failed_jobs_back_off_before_retrying(app):
+    worker = ThumbnailWorker(workers=0)
+    worker._app = app
+    sha256 = 'f' * 64
+    with app.app_context():
+        with db.engine.begin() as connection:
+            UploadBlob.ensure(connection, sha256, 'uploads/ff/ff/missing.png', 10)
+            ThumbnailJob.enqueue(connection, sha256)
+
+        assert worker.run_once()
+        job = ThumbnailJob.query.filter_by(sha256=sha256).one()
+        assert (job.status, job.attempts) == ('pending', 1)
+        assert job.locked_until > datetime.utcnow()
+        # Still backing off, so nothing is runnable
+        assert not worker.run_once()
+
+        job.locked_until = datetime.utcnow()
+        db.session.commit()
+        assert worker.run_once()
+        assert db.session.get(ThumbnailJob, job.id).attempts == 2
+
+        db.session.delete(db.session.get(ThumbnailJob, job.id))
+        db.session.delete(db.session.get(UploadBlob, sha256))
+        db.session.commit()
@@ -0,0 +1,21 @@
+import os
+import pytest
+
+@pytest.fixture
+def partial_upload(app):
+    folder = os.path.join(app.config['UPLOAD_FOLDER'], 'tmp')
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, 'partial.png')
+    with open(path, 'wb') as f:
+        f.write(b'half an image')
+    yield path
+    os.remove(path)
+
+@pytest.mark.parametrize('path', ['tmp/partial.png', './tmp/partial.png', 'x/../tmp/partial.png'])
+def test_partial_uploads_are_not_served(client, partial_upload, path):
+    assert client.get(f'/uploads/{path}').status_code == 404
+
+def test_proxy_is_sent_the_normalized_name(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'UPLOAD_ACCEL_REDIRECT', '/protected/')
+    response = client.get('/uploads/ab/./cd/../cd/image.png')
+    assert response.headers['X-Accel-Redirect'] == '/protected/ab/cd/image.png'
@@ -0,0 +1,16 @@
+import pytest
+from src.hashing import HashingBusy, password_hasher
+from src.seed import SEED_PASSWORD
+
+@pytest.mark.parametrize('limit', ['-5', '0'])
+def test_lookup_returns_at_least_one_user(client, tokens, limit):
+    response = client.get(f'/api/users/lookup?prefix=seed&limit={limit}', headers=tokens['admin'])
+    assert len(response.get_json()['users']) == 1
+
+def test_saturated_hashing_pool_answers_503(client, dataset, monkeypatch):
+    def busy(fn, *args):
+        raise HashingBusy('Password hashing pool is saturated')
+    monkeypatch.setattr(password_hasher, '_run', busy)
+    response = client.post('/api/auth/login', json={'username': dataset['username'], 'password': SEED_PASSWORD})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'